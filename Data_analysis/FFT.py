@@ -1,21 +1,26 @@
-import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import matplotlib.pyplot as plt
 import os
 import numpy as np
+from filters import ema
+from scipy.fft import rfft, rfftfreq
 
 CSV_FILE = "Oszi_recoding_0/Oszi_recoding.csv"
 CYCLE_TIME = 0.003  # seconds
 TARGET = "analog_diff_voltage"
 
 # read data
-df = pd.read_csv(os.path.join(os.path.dirname(__file__), CSV_FILE))
-signal = df[TARGET].values
+table = pacsv.read_csv(
+    os.path.join(os.path.dirname(__file__), CSV_FILE),
+    convert_options=pacsv.ConvertOptions(include_columns=[TARGET], column_types={TARGET: pa.float32()}))
+signal = table.column(TARGET).to_numpy()
 time = np.arange(len(signal)) * CYCLE_TIME
 
 # --- FFT ---
 fs = 1 / CYCLE_TIME  # sampling frequency
-freqs = np.fft.rfftfreq(len(signal), d=CYCLE_TIME)
-fft_vals = np.abs(np.fft.rfft(signal))
+freqs = rfftfreq(len(signal), d=CYCLE_TIME)
+fft_vals = np.abs(rfft(signal, workers=-1))
 
 # --- plot FFT spectrum ---
 plt.figure(figsize=(10, 4))
@@ -36,7 +41,7 @@ alpha = (omega_c * CYCLE_TIME) / (1 + omega_c * CYCLE_TIME)
 print(f"alpha: {alpha}")
 
 # --- apply EMA filter ---
-analog_diff_voltage_ema_filtered = df["analog_diff_voltage"].ewm(alpha=alpha, adjust=False).mean()
+analog_diff_voltage_ema_filtered = ema(signal, alpha)
 
 # --- plot filtered signal ---
 plt.figure(figsize=(10, 5))
@@ -0,0 +1,38 @@
+import os
+import polars as pl
+from recordings import parquet_path
+
+########### CHANGE HERE ###########
+# Directories containing the recorded CSV files, relative to this file
+INPUT_DIRS = [
+    "engage_time/data_engage_time",
+    "data_max_holding_force",
+    "release_time/data_release_time",
+]
+####################################
+
+
+def convert_dir(input_dir):
+    # write a .parquet copy next to each CSV file, skipping the ones that are already up to date
+    converted = 0
+    for entry in os.scandir(input_dir):
+        if not entry.name.endswith(".csv"):
+            continue
+        parquet_file = parquet_path(entry.path)
+        if os.path.exists(parquet_file) and os.path.getmtime(parquet_file) >= entry.stat().st_mtime:
+            continue
+        try:
+            pl.scan_csv(entry.path).sink_parquet(parquet_file, compression="zstd")
+            converted += 1
+        except Exception as e:
+            print(f"Error converting {entry.name}: {e}")
+    return converted
+
+
+if __name__ == "__main__":
+    for input_dir in INPUT_DIRS:
+        input_dir = os.path.join(os.path.dirname(__file__), input_dir)
+        if not os.path.isdir(input_dir):
+            print(f"Skipped: {input_dir} (not found)")
+            continue
+        print(f"{input_dir}: converted {convert_dir(input_dir)} files")
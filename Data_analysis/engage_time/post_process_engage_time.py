@@ -1,79 +1,124 @@
 import pandas as pd
+import polars as pl
 import numpy as np
 import os
 import re
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)) # shared helpers in Data_analysis
+from recordings import scan_recording
 
 ########### CHANGE HERE ###########
 INPUT_DIR = "data_engage_time/"  # Directory containing CSV files
-OUTPUT_FILE = "./Data_analysis/engage_time_summary.csv"
+OUTPUT_FILE = "./Data_analysis/engage_time_summary.parquet"
 ####################################
 
 # Constants
 CYCLE_TIME = 0.0015  # seconds
 EMA_ALPHA = 0.07011191019798384  # Exponential Moving Average alpha
-
-def detect_engage_time(force_data, threshold=1.0):
-    # Find the peak force
-    peak_idx = np.argmax(force_data)
-    # list of indices where the force drops below the threshold
-    engage_idx = np.where((force_data > threshold))[0][0] if len(np.where((force_data > threshold))[0]) > 0 else None
-
-    peak_force = force_data[peak_idx]
-
-    return engage_idx, peak_force
-
+ENGAGE_THRESHOLD = 1.0  # [N]
+FILENAME_PATTERN = re.compile(r"EngageTime_(\d.+)kV_flip_([\d.]+)_([\d.]+)\.csv")
+# one row of the summary, NaN when not detected
+RESULT_DTYPE = np.dtype([
+    ("Voltage[V]", "f8"),
+    ("Flipping period[s]", "f8"),
+    ("Engage time[s]", "f8"),
+])
+# what a single bad recording raises (unreadable or truncated file, missing column, wrong type)
+RECORDING_ERRORS = (
+    OSError,
+    pl.exceptions.ComputeError,
+    pl.exceptions.ColumnNotFoundError,
+    pl.exceptions.SchemaError,
+    pl.exceptions.NoDataError,
+    pl.exceptions.InvalidOperationError,
+)
 
 def extract_parameters(filename):
-    match = re.match(r"EngageTime_(\d.+)kV_flip_([\d.]+)_([\d.]+)\.csv", filename)
+    match = FILENAME_PATTERN.match(filename)
     if match:
         voltage = float(match.group(1)) * 1000  # Convert kV to V
         flipping = float(match.group(2))
         return voltage, flipping
     return None, None
 
-# List all CSV files in the directory
-results = []
+def summary_plan(paths):
+    """
+    Lazy Polars plan that reads, filters and reduces the given recordings.
+    One row per file: path, peak_force, engage_time (null if the force never exceeds the threshold).
+    """
+    force_ema = pl.col("force_ema")
+    recordings = [
+        scan_recording(path).select(pl.lit(path).alias("path"), pl.col("Force(N)").cast(pl.Float32))
+        for path in paths
+    ]
+    return (
+        pl.concat(recordings)
+        .select(
+            "path",
+            # same as ewm(alpha, adjust=False): y[0] = x[0]
+            pl.col("Force(N)").ewm_mean(alpha=EMA_ALPHA, adjust=False).over("path").alias("force_ema"),
+        )
+        .group_by("path")
+        .agg(
+            force_ema.max().alias("peak_force"),
+            # samples are CYCLE_TIME apart, so the engage time is the index of the first sample above the threshold
+            (pl.int_range(pl.len()).filter(force_ema > ENGAGE_THRESHOLD).first() * CYCLE_TIME).alias("engage_time"),
+        )
+    )
+
+def summarize(paths):
+    """
+    Summarize all recordings in one plan. If a recording breaks it (e.g. a truncated file or a missing column),
+    retry file by file so that the bad files are reported and skipped. Other errors are raised.
+    """
+    try:
+        return summary_plan(paths).collect()
+    except RECORDING_ERRORS as e:
+        print(f"Combined summary failed ({type(e).__name__}: {e}), retrying file by file")
+    summaries = []
+    for path in paths:
+        try:
+            summaries.append(summary_plan([path]).collect())
+        except RECORDING_ERRORS as e:
+            print(f"Error processing {os.path.basename(path)}: {e}")
+    if not summaries:
+        return pl.DataFrame(schema={"path": pl.String, "peak_force": pl.Float32, "engage_time": pl.Float64})
+    return pl.concat(summaries)
 
-for fname in os.listdir(os.path.join(os.path.dirname(__file__), INPUT_DIR)):
-    if fname.endswith(".csv"):
-        voltage, flip = extract_parameters(fname)
+
+def run_engage():
+    # List all CSV files in the directory
+    paths = {}
+    params = {}
+    for entry in os.scandir(os.path.join(os.path.dirname(__file__), INPUT_DIR)):
+        if not entry.name.endswith(".csv"):
+            continue
+        voltage, flip = extract_parameters(entry.name)
         if None in (voltage, flip):
-            print(f"Skipped: {fname} (Invalid filename format)")
+            print(f"Skipped: {entry.name} (Invalid filename format)")
             continue
+        paths[entry.name] = entry.path
+        params[entry.name] = (voltage, flip)
 
-        filepath = os.path.join(INPUT_DIR, fname)
-        try:
-            #df = pd.read_csv(filepath)
-            df = pd.read_csv(
-                os.path.join(os.path.dirname(__file__), filepath),
-                parse_dates=["Time(s)"],)
-            analog_voltage = df["Engage_flag"]  # df["analog_voltage"]
-            force_ema = df["Force(N)"].ewm(alpha=EMA_ALPHA, adjust=False).mean()
-            time = df["Time(s)"]
-            start_time = time[0]
-
-            engage_idx, peak_force = detect_engage_time(force_ema)
-            if engage_idx is not None:
-                engage_time = (time[engage_idx] - start_time).total_seconds()
-                if peak_force < 1.0:
-                    #engage_time = None
-                    print(f"Peak force too low in {fname}")
-            else:
-                engage_time = None
+    results = np.empty(0, dtype=RESULT_DTYPE)
+    if params:
+        summary = summarize(list(paths.values()))
+        results = np.empty(len(summary), dtype=RESULT_DTYPE)
+        for k, (path, peak_force, engage_time) in enumerate(summary.iter_rows()):
+            fname = os.path.basename(path)
+            voltage, flip = params[fname]
+            if engage_time is None:
                 print(f"engage time not detected in {fname}")
+            elif peak_force < 1.0:
+                #engage_time = None
+                print(f"Peak force too low in {fname}")
+            results[k] = (voltage, flip, np.nan if engage_time is None else engage_time)
 
-            results.append({
-                "Voltage[V]": voltage,
-                "Flipping period[s]": flip,
-                "Engage time[s]": engage_time
-            })
-        except Exception as e:
-            print(f"Error processing {fname}: {e}")
+    # Save results; the plot scripts group (and thereby sort) the table themselves
+    results_df = pd.DataFrame(results)
+    results_df.to_parquet(OUTPUT_FILE, index=False, compression="zstd")
+    print(f"Summary saved to {OUTPUT_FILE}")
 
-# Save results to CSV
-results_df = pd.DataFrame(results)
-results_df = results_df.sort_values(
-    by=["Voltage[V]", "Flipping period[s]"],
-)
-results_df.to_csv(OUTPUT_FILE, index=False)
-print(f"Summary saved to {OUTPUT_FILE}")
+
+if __name__ == "__main__":
+    run_engage()
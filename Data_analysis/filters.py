@@ -0,0 +1,14 @@
+import numpy as np
+from scipy.signal import lfilter
+
+
+def ema(x, alpha):
+    """
+    Exponential moving average of x, computed in float32.
+    y[n] = alpha*x[n] + (1-alpha)*y[n-1] with y[0] = x[0] (same as ewm(alpha, adjust=False))
+    """
+    x = np.asarray(x, dtype=np.float32)
+    b = np.array([alpha], dtype=np.float32)
+    a = np.array([1.0, alpha - 1.0], dtype=np.float32)
+    y, _ = lfilter(b, a, x, zi=(1.0 - b) * x[:1])
+    return y
@@ -1,8 +1,14 @@
-import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import numpy as np
+import matplotlib
+matplotlib.use("Agg")  # 非対話バックエンド（GUIなしで画像保存）
 import matplotlib.pyplot as plt
-from scipy.signal import iirnotch, filtfilt, find_peaks, butter
+from scipy.signal import iirnotch, filtfilt, find_peaks, butter, tf2sos, sosfiltfilt
+from scipy.fft import rfft, rfftfreq
+from scipy.ndimage import uniform_filter1d
 import os
+from functools import lru_cache
 
 ############ CHANGE HERE ############
 USE_FFT = True  # True: FFTでピーク周波数を自動検出
@@ -12,6 +18,8 @@ NOTCH_NUM = 10       # ノッチフィルタの数（ピーク数）
 CUTOFF_LP1 = 500.0   # ローパスフィルタのカットオフ周波数 [Hz]
 CUTOFF_LP2 = 300.0   # ローパスフィルタのカットオフ周波数 [Hz]
 LP_ORDER = 4        # ローパスフィルタの次数
+PLOT_DIR = 'plots_leakage_current'  # グラフの保存先ディレクトリ
+DEBUG_PLOT = False  # True: 途中段階のFFT・信号もプロット
 #####################################
 
 import os
@@ -20,12 +28,28 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from scipy.signal import butter, filtfilt, iirnotch, find_peaks
 
-# --- ローパスフィルタ定義 ---
-def apply_butter_lowpass_filter(data, cutoff, fs, order=4):
+# --- フィルタ係数のキャッシュ ---
+@lru_cache(maxsize=256)
+def _butter_sos(cutoff, fs, order):
     nyq = 0.5 * fs
     norm_cutoff = cutoff / nyq
-    b, a = butter(order, norm_cutoff, btype='low', analog=False)
-    return filtfilt(b, a, data)
+    return butter(order, norm_cutoff, btype='low', analog=False, output='sos')
+
+@lru_cache(maxsize=256)
+def _notch_coeffs(f0, Q, fs):
+    return iirnotch(f0, Q, fs)
+
+# --- グラフ保存 ---
+def save_figure(title):
+    plot_dir = os.path.join(os.path.dirname(__file__), PLOT_DIR)
+    os.makedirs(plot_dir, exist_ok=True)
+    plt.savefig(os.path.join(plot_dir, f"{title.replace(' ', '_')}.png"))
+    plt.close()
+
+# --- ローパスフィルタ定義 ---
+def apply_butter_lowpass_filter(data, cutoff, fs, order=4):
+    sos = _butter_sos(cutoff, fs, order)
+    return sosfiltfilt(sos, data)
 
 def plot_filtered_signal(time, original_signal, filtered_signal, title='Filtered Signal'):
     plt.figure(figsize=(10, 5))
@@ -37,18 +61,18 @@ def plot_filtered_signal(time, original_signal, filtered_signal, title='Filtered
     plt.legend()
     plt.grid(True)
     plt.tight_layout()
-    plt.show()
+    save_figure(title)
 
 def fft_analysis(signal, dt, peak_num=5):
     N = len(signal)
-    fft_vals = np.fft.fft(signal)
-    fft_freqs = np.fft.fftfreq(N, d=dt)
+    fft_vals = rfft(signal, workers=-1)
+    fft_freqs = rfftfreq(N, d=dt)
     amplitude = np.abs(fft_vals)
 
     # 正の周波数だけ取得（DC除外）
-    pos_mask = (fft_freqs > 1)
-    pos_freqs = fft_freqs[pos_mask]
-    pos_amplitude = amplitude[pos_mask]
+    start = np.searchsorted(fft_freqs, 1, side='right')
+    pos_freqs = fft_freqs[start:]
+    pos_amplitude = amplitude[start:]
 
     # ピーク検出
     peak_indices, properties = find_peaks(pos_amplitude, height=np.max(pos_amplitude) * 0.1)
@@ -56,10 +80,10 @@ def fft_analysis(signal, dt, peak_num=5):
     peak_heights = properties['peak_heights']
 
     # 上位 N 個のピーク周波数を取得
-    if len(peak_freqs) >= peak_num:
-        top_indices = np.argsort(peak_heights)[-peak_num:]
+    if len(peak_freqs) > peak_num:
+        top_indices = np.argpartition(peak_heights, -peak_num)[-peak_num:]
     else:
-        top_indices = np.argsort(peak_heights)
+        top_indices = np.arange(len(peak_heights))
 
     top_peak_freqs = peak_freqs[top_indices]
     top_peak_heights = peak_heights[top_indices]
@@ -76,34 +100,47 @@ def plot_fft_signal(pos_freqs, pos_amplitude, peak_freqs, peak_heights, top_peak
     plt.title(title)
     plt.grid(True)
     plt.tight_layout()
-    plt.show()
+    save_figure(title)
 
 def apply_notch_filter(signal, f0, Q, fs):
-    b, a = iirnotch(f0, Q, fs)
+    b, a = _notch_coeffs(f0, Q, fs)
     return filtfilt(b, a, signal)
 
+def apply_notch_filters(signal, freqs, Q, fs):
+    # 全ノッチを1つのSOSカスケードにまとめ、sosfiltfiltを1回だけ適用
+    if len(freqs) == 0:
+        return signal
+    sos = np.vstack([tf2sos(*_notch_coeffs(f0, Q, fs)) for f0 in freqs])
+    return sosfiltfilt(sos, signal)
+
 def apply_moving_average_filter(signal, window_size):
-    return np.convolve(signal, np.ones(window_size)/window_size, mode='same')
+    return uniform_filter1d(signal, size=window_size, mode='nearest')
 
 
 def main():
     # CSV読み込み
-    df = pd.read_csv(os.path.join(os.path.dirname(__file__), CSV_FILE))
+    table = pacsv.read_csv(
+        os.path.join(os.path.dirname(__file__), CSV_FILE),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=['Time(s)', 'Current(uA)'],
+            column_types={'Time(s)': pa.float64(), 'Current(uA)': pa.float32()}))
 
     # 時間・電流信号取得
-    time = df['Time(s)'].values
-    current_uA = df['Current(uA)'].values
+    time = table.column('Time(s)').to_numpy()
+    current_uA = table.column('Current(uA)').to_numpy()
 
     # サンプリング周波数の計算
     dt = np.mean(np.diff(time))
     fs = 1 / dt
 
-    pos_freqs, pos_amplitude, peak_freqs, peak_heights, top_peak_freqs, top_indices = fft_analysis(current_uA, dt, peak_num=NOTCH_NUM)
-    plot_fft_signal(pos_freqs, pos_amplitude, peak_freqs, peak_heights, top_peak_freqs, top_indices, CUTOFF_LP1, peak_num=NOTCH_NUM, title='FFT Signal before Filtering')
+    if DEBUG_PLOT:
+        pos_freqs, pos_amplitude, peak_freqs, peak_heights, top_peak_freqs, top_indices = fft_analysis(current_uA, dt, peak_num=NOTCH_NUM)
+        plot_fft_signal(pos_freqs, pos_amplitude, peak_freqs, peak_heights, top_peak_freqs, top_indices, CUTOFF_LP1, peak_num=NOTCH_NUM, title='FFT Signal before Filtering')
 
     # --- 最初のローパスフィルタ ---
     current_lp1 = apply_butter_lowpass_filter(current_uA, CUTOFF_LP1, fs, order=LP_ORDER)
-    plot_filtered_signal(time, current_uA, current_lp1, title='Filtered Signal after First Lowpass Filter')
+    if DEBUG_PLOT:
+        plot_filtered_signal(time, current_uA, current_lp1, title='Filtered Signal after First Lowpass Filter')
 
     # --- ノッチフィルタの準備と適用 ---
     filtered_current = current_lp1.copy()
@@ -111,34 +148,34 @@ def main():
     if USE_FFT:
         # ===== First Notch Filter =====
         pos_freqs, pos_amplitude, peak_freqs, peak_heights, top_peak_freqs, top_indices = fft_analysis(filtered_current, dt, peak_num=NOTCH_NUM)
-        plot_fft_signal(pos_freqs, pos_amplitude, peak_freqs, peak_heights, top_peak_freqs, top_indices, CUTOFF_LP1, peak_num=NOTCH_NUM, title='FFT Signal after First Lowpass Filter')
+        if DEBUG_PLOT:
+            plot_fft_signal(pos_freqs, pos_amplitude, peak_freqs, peak_heights, top_peak_freqs, top_indices, CUTOFF_LP1, peak_num=NOTCH_NUM, title='FFT Signal after First Lowpass Filter')
 
         print(f"Top {len(top_peak_freqs)} peak frequencies to apply notch filters: {top_peak_freqs}")
 
         # --- ノッチフィルタの適用 ---
-        for f0 in top_peak_freqs:
-            filtered_current = apply_notch_filter(filtered_current, f0, NOTCH_Q, fs)
+        filtered_current = apply_notch_filters(filtered_current, top_peak_freqs, NOTCH_Q, fs)
 
-        # --- フィルタ後のFFT表示 ---
+        # --- フィルタ後のFFT表示（2段目のノッチ周波数の検出にも使用） ---
         pos_freqs, pos_amplitude, _, _, top_peak_freqs, top_indices = fft_analysis(filtered_current, dt, peak_num=NOTCH_NUM)
-        plot_fft_signal(pos_freqs, pos_amplitude, [], [], top_peak_freqs, top_indices, CUTOFF_LP1, peak_num=NOTCH_NUM, title='FFT Signal after first Notch Filter')
+        if DEBUG_PLOT:
+            plot_fft_signal(pos_freqs, pos_amplitude, [], [], top_peak_freqs, top_indices, CUTOFF_LP1, peak_num=NOTCH_NUM, title='FFT Signal after first Notch Filter')
 
-        plot_filtered_signal(time, current_uA, filtered_current, title='Filtered Signal after First Notch Filter')
+            plot_filtered_signal(time, current_uA, filtered_current, title='Filtered Signal after First Notch Filter')
 
         # ===== Second Notch Filter =====
         """ pos_freqs, pos_amplitude, peak_freqs, peak_heights, top_peak_freqs, top_indices = fft_analysis(filtered_current, dt, peak_num=NOTCH_NUM)
         plot_fft_signal(pos_freqs, pos_amplitude, peak_freqs, peak_heights, top_peak_freqs, top_indices, CUTOFF_LP1, peak_num=NOTCH_NUM, title='FFT Signal after First Notch Filter') """
         print(f"Top {len(top_peak_freqs)} peak frequencies to apply notch filters: {top_peak_freqs}")
         # --- ノッチフィルタの適用 ---
-        for f0 in top_peak_freqs:
-            b, a = iirnotch(f0, NOTCH_Q, fs)
-            filtered_current = filtfilt(b, a, filtered_current)
+        filtered_current = apply_notch_filters(filtered_current, top_peak_freqs, NOTCH_Q, fs)
         
-        # --- フィルタ後のFFT表示 ---
-        pos_freqs, pos_amplitude, _, _, top_peak_freqs, top_indices = fft_analysis(filtered_current, dt, peak_num=NOTCH_NUM)
-        plot_fft_signal(pos_freqs, pos_amplitude, [], [], top_peak_freqs, top_indices, CUTOFF_LP1, peak_num=NOTCH_NUM, title='FFT Signal after Second Notch Filter')
-        # --- フィルタ後の信号プロット ---
-        plot_filtered_signal(time, current_uA, filtered_current, title='Filtered Signal after Second Notch Filter')
+        if DEBUG_PLOT:
+            # --- フィルタ後のFFT表示 ---
+            pos_freqs, pos_amplitude, _, _, top_peak_freqs, top_indices = fft_analysis(filtered_current, dt, peak_num=NOTCH_NUM)
+            plot_fft_signal(pos_freqs, pos_amplitude, [], [], top_peak_freqs, top_indices, CUTOFF_LP1, peak_num=NOTCH_NUM, title='FFT Signal after Second Notch Filter')
+            # --- フィルタ後の信号プロット ---
+            plot_filtered_signal(time, current_uA, filtered_current, title='Filtered Signal after Second Notch Filter')
         
 
         # --- 最後のローパスフィルタ ---
@@ -1,18 +1,16 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)) # shared helpers in Data_analysis
+from recordings import load_aggregated
 
 ########## CHANGE HERE ###########
-CSV_FILE = "./Data_analysis/max_holding_force_summary.csv"  # Path to the CSV file
+SUMMARY_FILE = "./Data_analysis/max_holding_force_summary.parquet"  # Path to the summary written by the post-processing script
 ##################################
 
 
-# Load the CSV file
-df = pd.read_csv(CSV_FILE)
-
-# Check if the DataFrame is empty
-df = df.dropna(subset=["Max holding force[N]"])
-
 # Define the column to group by
 group_by_var = "Flipping period[s]"
 
@@ -22,12 +20,19 @@ fixed_conditions = {
     "Activated time[s]": 0.2,
 }
 
-# filter the DataFrame based on fixed conditions
-for col, val in fixed_conditions.items():
-    df = df[df[col] == val]
+def aggregate(df):
+    # Check if the DataFrame is empty
+    df = df.dropna(subset=["Max holding force[N]"])
+
+    # filter the DataFrame based on fixed conditions
+    for col, val in fixed_conditions.items():
+        df = df[df[col] == val]
 
-# Group by the specified variable and calculate mean and SEM
-grouped = df.groupby(["Voltage[V]", "Flipping period[s]"])["Max holding force[N]"].agg(['mean', 'sem']).reset_index()
+    # Group by the specified variable and calculate mean and SEM
+    return df.groupby(["Voltage[V]", "Flipping period[s]"])["Max holding force[N]"].agg(['mean', 'sem']).reset_index()
+
+# The aggregated table is cached next to the summary file (see recordings.load_aggregated)
+grouped = load_aggregated(SUMMARY_FILE, fixed_conditions, aggregate)
 num_plots = 1
 
 # Plotting
@@ -37,23 +42,16 @@ fig, axes = plt.subplots(nrows=1, ncols=num_plots, figsize=(5 * num_plots, 5), s
 if num_plots == 1:
     axes = [axes]  # in case of a single subplot, ensure axes is iterable
 
-flip_values = sorted(grouped["Flipping period[s]"].unique())
-
-# Loop through each flipping period
-for flip in flip_values:
-    # Filter the DataFrame for the current voltage
-    flip_group = grouped[grouped["Flipping period[s]"] == flip]
-
-    # Plotting the data
-    for flipping_period, group in flip_group.groupby("Flipping period[s]"):
-        axes[0].errorbar(
-            group["Voltage[V]"],
-            group["mean"],
-            yerr=group["sem"],
-            marker='o',
-            linestyle='-',
-            label=f'Flipping = {flipping_period}s'
-        )
+# Plotting the data for each flipping period (groupby yields them sorted)
+for flipping_period, group in grouped.groupby("Flipping period[s]"):
+    axes[0].errorbar(
+        group["Voltage[V]"],
+        group["mean"],
+        yerr=group["sem"],
+        marker='o',
+        linestyle='-',
+        label=f'Flipping = {flipping_period}s'
+    )
 
 axes[0].set_title("Max holding force")
 axes[0].set_xlabel("Voltage [V]")
@@ -1,29 +1,67 @@
 import pandas as pd
+import polars as pl
 import numpy as np
 import os
-import re
+import multiprocessing
 from scipy.signal import find_peaks
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)) # shared helpers in Data_analysis
+from filters import ema
+from recordings import scan_recording
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:
+    # Numba is optional, each series is filtered with scipy's lfilter without it
+    HAVE_NUMBA = False
 
 ########### CHANGE HERE ###########
 INPUT_DIR = "./Data_analysis/data_max_holding_force"  # Directory containing CSV files
-OUTPUT_FILE = "./Data_analysis/max_holding_force_summary.csv"
+OUTPUT_FILE = "./Data_analysis/max_holding_force_summary.parquet"
 ####################################
 
 # Constants
 CYCLE_TIME = 0.0015  # seconds
 EMA_ALPHA = 0.07011191019798384  # Exponential Moving Average alpha
+# one row of the summary, NaN when not detected
+RESULT_DTYPE = np.dtype([
+    ("Voltage[V]", "f8"),
+    ("Activated time[s]", "f8"),
+    ("Flipping period[s]", "f8"),
+    ("Max holding force[N]", "f8"),
+])
+
+if HAVE_NUMBA:
+    @njit(parallel=True, cache=True, fastmath=True)
+    def ema_batch(flat, offsets, alpha, out):
+        # EMA of every series packed in `flat`; series k is flat[offsets[k]:offsets[k+1]]
+        # y[n] = alpha*x[n] + (1-alpha)*y[n-1] with y[0] = x[0] (same as ewm(alpha, adjust=False))
+        one_m = 1.0 - alpha
+        for k in prange(offsets.shape[0] - 1):
+            s, e = offsets[k], offsets[k + 1]
+            if e > s:
+                out[s] = flat[s]
+                for i in range(s + 1, e):
+                    out[i] = alpha * flat[i] + one_m * out[i - 1]
+else:
+    def ema_batch(flat, offsets, alpha, out):
+        for k in range(offsets.shape[0] - 1):
+            s, e = offsets[k], offsets[k + 1]
+            if e > s:
+                out[s:e] = ema(flat[s:e], alpha)
 
 def detect_max_holding_force(force_ema, distance=100, prominence=0.05):
     """
     Detect the maximum holding force using `find_peaks` with stricter conditions.
     Parameters:
-        force_ema: EMA-filtered force data (pd.Series)
+        force_ema: EMA-filtered force data (ndarray or array-like)
         distance: Minimum number of samples between peaks
         prominence: Minimum prominence of peaks to be considered
     Returns:
         max_holding_force: Value of max force
         peak_idx: Index of the detected peak
     """
+    force_ema = np.asarray(force_ema)
     # Set the height to a percentage of the maximum value
     height = 0.7 * force_ema.max()  # Set height to 10% of the maximum value
     # Detect local maxima (peaks)
@@ -35,69 +73,93 @@ def detect_max_holding_force(force_ema, distance=100, prominence=0.05):
     if len(peaks) == 0:
         return None  # No peaks detected
 
-    # get the first 2 peaks
-    if len(peaks) > 2:
-        peaks = peaks[:2]
-    else:
-        peaks = peaks
-        max_holding_force = force_ema.iloc[peaks].max()
-        return max_holding_force, peaks
-    
     # Get the maximum value among the first 2 peaks
-    #max_holding_force = force_ema.iloc[peaks].max()
-    if force_ema.iloc[peaks[0]] < force_ema.iloc[peaks[1]]:
-        max_holding_force = force_ema.iloc[peaks[1]]
-        peak_idx = peaks[1]
-    else:
-        max_holding_force = force_ema.iloc[peaks[0]]
-        peak_idx = peaks[0]
-    
+    peaks = peaks[:2]
+    peak_idx = peaks[np.argmax(force_ema[peaks])]
+    max_holding_force = force_ema[peak_idx]
+
     return max_holding_force, peak_idx
 
 
 def extract_parameters(filename):
-    match = re.match(r"(\d+)V-activated-([\d.]+)-flip-([\d.]+)-([\d.]+)\.csv", filename)
-    if match:
-        voltage = float(match.group(1))
-        activated_time = float(match.group(2))
-        flipping = float(match.group(3))
-        return voltage, activated_time, flipping
-    return None, None, None
-
-# List all CSV files in the directory
-results = []
-
-for fname in os.listdir(INPUT_DIR):
-    if fname.endswith(".csv"):
-        voltage, activated_time, flip = extract_parameters(fname)
-        if None in (voltage, activated_time, flip):
-            print(f"Skipped: {fname} (Invalid filename format)")
-            continue
-
-        filepath = os.path.join(INPUT_DIR, fname)
-        try:
-            df = pd.read_csv(filepath)
-            analog_voltage = df["analog_voltage"]
-            force_ema = df["estimated_analog_force"].ewm(alpha=EMA_ALPHA, adjust=False).mean()
-            time = pd.to_datetime(df["Timestamp"], format="ISO8601")
-
-            max_holding_force, peak_idx = detect_max_holding_force(force_ema)
-            if max_holding_force is None:
-                print(f"Max holding force not detected in {fname}")
-
-            results.append({
-                "Voltage[V]": voltage,
-                "Activated time[s]": activated_time,
-                "Flipping period[s]": flip,
-                "Max holding force[N]": max_holding_force,
-            })
-        except Exception as e:
-            print(f"Error processing {fname}: {e}")
-
-# Save results to CSV
-results_df = pd.DataFrame(results)
-results_df = results_df.sort_values(
-    by=["Voltage[V]", "Activated time[s]", "Flipping period[s]"],
-)
-results_df.to_csv(OUTPUT_FILE, index=False)
-print(f"Summary saved to {OUTPUT_FILE}")
+    # e.g. 100V-activated-0.5-flip-0.1-1.csv -> ["100V", "activated", "0.5", "flip", "0.1", "1"]
+    parts = filename[:-len(".csv")].split("-")
+    if (not filename.endswith(".csv") or len(parts) != 6
+            or parts[1] != "activated" or parts[3] != "flip"
+            or not parts[0].endswith("V") or not parts[0][:-1].isdigit()):
+        return None, None, None
+    try:
+        voltage = float(parts[0][:-1])
+        activated_time = float(parts[2])
+        flipping = float(parts[4])
+        float(parts[5])  # trial number
+    except ValueError:
+        return None, None, None
+    return voltage, activated_time, flipping
+
+def load_file(filepath):
+    fname = os.path.basename(filepath)
+    voltage, activated_time, flip = extract_parameters(fname)
+    if None in (voltage, activated_time, flip):
+        print(f"Skipped: {fname} (Invalid filename format)")
+        return None
+
+    try:
+        # only the force feeds the peak detection
+        df = scan_recording(filepath).select(
+            pl.col("estimated_analog_force").cast(pl.Float32),
+        ).collect()
+        force = df["estimated_analog_force"].to_numpy()
+        return fname, voltage, activated_time, flip, force
+    except Exception as e:
+        print(f"Error processing {fname}: {e}")
+        return None
+
+
+def process_file(fname, voltage, activated_time, flip, force_ema):
+    try:
+        max_holding_force, peak_idx = detect_max_holding_force(force_ema)
+        if max_holding_force is None:
+            print(f"Max holding force not detected in {fname}")
+
+        return voltage, activated_time, flip, (np.nan if max_holding_force is None else max_holding_force)
+    except Exception as e:
+        print(f"Error processing {fname}: {e}")
+        return None
+
+
+def run_max_force(processes=None):
+    # List all CSV files in the directory, largest first so the pool stays balanced
+    entries = [e for e in os.scandir(INPUT_DIR) if e.name.endswith(".csv")]
+    entries.sort(key=lambda e: -e.stat().st_size)
+
+    # Each file is independent, so load them in parallel
+    # spawn, not fork: run_all.py runs Polars threads in this process at the same time, and forking
+    # while its thread pool is busy can deadlock the workers
+    with multiprocessing.get_context("spawn").Pool(processes) as p:
+        loaded = [r for r in p.imap_unordered(load_file, (e.path for e in entries), chunksize=4) if r]
+
+    # Filter all force traces with one parallel EMA call
+    lengths = [len(force) for *_, force in loaded]
+    offsets = np.zeros(len(loaded) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    flat = np.concatenate([force for *_, force in loaded]) if loaded else np.empty(0, dtype=np.float32)
+    force_ema = np.empty_like(flat)
+    ema_batch(flat, offsets, EMA_ALPHA, force_ema)
+
+    results = np.empty(len(loaded), dtype=RESULT_DTYPE)
+    n = 0
+    for k, (fname, voltage, activated_time, flip, _) in enumerate(loaded):
+        r = process_file(fname, voltage, activated_time, flip, force_ema[offsets[k]:offsets[k + 1]])
+        if r:
+            results[n] = r
+            n += 1
+
+    # Save results; the plot scripts group (and thereby sort) the table themselves
+    results_df = pd.DataFrame(results[:n])
+    results_df.to_parquet(OUTPUT_FILE, index=False, compression="zstd")
+    print(f"Summary saved to {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    run_max_force()
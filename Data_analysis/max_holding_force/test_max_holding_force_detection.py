@@ -11,6 +11,9 @@ import matplotlib.pyplot as plt
 import os
 import numpy as np
 from scipy.signal import find_peaks
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)) # shared helpers in Data_analysis
+from filters import ema
 import re
 
 # Constants
@@ -20,7 +23,11 @@ CYCLE_TIME = 0.0015  # seconds
 EMA_ALPHA = 0.07011191019798384  # Exponential Moving Average alpha
 
 # reading the CSV file
-df = pd.read_csv(os.path.join(os.path.dirname(__file__), CSV_FILE))
+df = pd.read_csv(
+                os.path.join(os.path.dirname(__file__), CSV_FILE),
+                engine="pyarrow",
+                usecols=["Timestamp", "analog_voltage", "estimated_analog_force"],
+                dtype={"analog_voltage": "float64", "estimated_analog_force": "float32"},)
 
 # Analog voltage for voltage status
 analog_voltage = df["analog_voltage"]
@@ -31,19 +38,20 @@ start_time = time[0]
 plot_idx = time < start_time + pd.Timedelta(seconds=30)
 
 # apply EMA to estimated_analog_force
-estimated_analog_force_ema_filtered = df["estimated_analog_force"].ewm(alpha=EMA_ALPHA, adjust=False).mean()
+estimated_analog_force_ema_filtered = ema(df["estimated_analog_force"].to_numpy(), EMA_ALPHA)
 
 def detect_max_holding_force(force_ema, distance=100, prominence=0.05):
     """
     Detect the maximum holding force using `find_peaks` with stricter conditions.
     Parameters:
-        force_ema: EMA-filtered force data (pd.Series)
+        force_ema: EMA-filtered force data (ndarray or array-like)
         distance: Minimum number of samples between peaks
         prominence: Minimum prominence of peaks to be considered
     Returns:
         max_holding_force: Value of max force
         peak_idx: Index of the detected peak
     """
+    force_ema = np.asarray(force_ema)
     # Set the height to a percentage of the maximum value
     height = 0.7 * force_ema.max()  # Set height to 10% of the maximum value
 
@@ -56,23 +64,11 @@ def detect_max_holding_force(force_ema, distance=100, prominence=0.05):
     if len(peaks) == 0:
         return None  # No peaks detected
 
-    # get the first 2 peaks
-    if len(peaks) > 2:
-        peaks = peaks[:2]
-    else:
-        peaks = peaks
-        max_holding_force = force_ema.iloc[peaks].max()
-        return max_holding_force, peaks
-    
     # Get the maximum value among the first 2 peaks
-    #max_holding_force = force_ema.iloc[peaks].max()
-    if force_ema.iloc[peaks[0]] < force_ema.iloc[peaks[1]]:
-        max_holding_force = force_ema.iloc[peaks[1]]
-        peak_idx = peaks[1]
-    else:
-        max_holding_force = force_ema.iloc[peaks[0]]
-        peak_idx = peaks[0]
-    
+    peaks = peaks[:2]
+    peak_idx = peaks[np.argmax(force_ema[peaks])]
+    max_holding_force = force_ema[peak_idx]
+
     return max_holding_force, peak_idx
 
 
@@ -1,6 +1,8 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import os
+import numpy as np
+from filters import ema
 
 # Constants
 CSV_FILE = "data_release_time/ReleaseTime_0.08kV_flip_0.05_alpha_0_0.csv"  # Path to the CSV file
@@ -12,21 +14,26 @@ TARGET = "measured_force"  # The target column to plot
 #TARGET = "analog_diff_voltage"  # The target column to plot
 
 # reading the CSV file
+usecols = ["Time(s)", "Force(N)", "Engage_flag"]
+if TARGET != "measured_force":
+    usecols.append(TARGET)
 df = pd.read_csv(
                 os.path.join(os.path.dirname(__file__), CSV_FILE),
+                engine="pyarrow",
+                usecols=usecols,
                 parse_dates=["Time(s)"],)
 
 # Check if the DataFrame is empty
 #time = [i * CYCLE_TIME for i in range(len(df))]
 
-# read time as datetime
-time = df["Time(s)"]
+# read time as seconds since the first sample
+timestamp_ns = df["Time(s)"].to_numpy(dtype="datetime64[ns]").view("i8")
+time = (timestamp_ns - timestamp_ns[0]) * 1e-9
 print(time)
-start_time = time[0]
-plot_idx = time < start_time + pd.Timedelta(seconds=5.0)
+plot_idx = time < 5.0
 
 # apply EMA to estimated_analog_force
-force_ema_filtered = df["Force(N)"].ewm(alpha=EMA_ALPHA, adjust=False).mean()
+force_ema_filtered = ema(df["Force(N)"].to_numpy(dtype=np.float32), EMA_ALPHA)
 print(force_ema_filtered[plot_idx].max())
 
 
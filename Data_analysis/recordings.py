@@ -0,0 +1,33 @@
+import hashlib
+import os
+import pathlib
+import pandas as pd
+import polars as pl
+
+
+def parquet_path(csv_path):
+    # the Parquet copy of a recording, written next to the CSV file by convert_to_parquet.py
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+
+def scan_recording(filepath):
+    # prefer the Parquet copy written by convert_to_parquet.py when it is up to date
+    parquet_file = parquet_path(filepath)
+    if os.path.exists(parquet_file) and os.path.getmtime(parquet_file) >= os.path.getmtime(filepath):
+        return pl.scan_parquet(parquet_file)
+    return pl.scan_csv(filepath)
+
+
+def load_aggregated(summary_file, fixed_conditions, aggregate):
+    """
+    Returns aggregate(df) of the summary table in summary_file.
+    The result is cached next to the summary file and rebuilt when the
+    summary is newer than the cache or the fixed conditions change.
+    """
+    conditions_key = hashlib.md5(repr(sorted(fixed_conditions.items())).encode()).hexdigest()[:8]
+    cache_file = pathlib.Path(summary_file).with_suffix(f".{conditions_key}.agg.parquet")
+    if cache_file.exists() and cache_file.stat().st_mtime >= pathlib.Path(summary_file).stat().st_mtime:
+        return pd.read_parquet(cache_file)
+    grouped = aggregate(pd.read_parquet(summary_file))
+    grouped.to_parquet(cache_file, index=False)
+    return grouped
@@ -1,19 +1,17 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)) # shared helpers in Data_analysis
+from recordings import load_aggregated
 
 ########## CHANGE HERE ###########
-CSV_FILE = "./Data_analysis/release_time_summary.csv"  # Path to the CSV file
+SUMMARY_FILE = "./Data_analysis/release_time_summary.parquet"  # Path to the summary written by the post-processing script
 PLOT_ONLY_LESS_THAN_160V = True  # Set to True to plot only voltages less than 160V
 ##################################
 
 
-# Load the CSV file
-df = pd.read_csv(CSV_FILE)
-
-# Check if the DataFrame is empty
-df = df.dropna(subset=["Release time[s]"])
-
 # Define the column to group by
 group_by_var = "Flipping period[s]"
 
@@ -24,12 +22,19 @@ fixed_conditions = {
     "Decaying alpha": 0,
 }
 
-# filter the DataFrame based on fixed conditions
-for col, val in fixed_conditions.items():
-    df = df[df[col] == val]
+def aggregate(df):
+    # Check if the DataFrame is empty
+    df = df.dropna(subset=["Release time[s]"])
+
+    # filter the DataFrame based on fixed conditions
+    for col, val in fixed_conditions.items():
+        df = df[df[col] == val]
+
+    # Group by the specified variable and calculate mean and SEM
+    return df.groupby(["Decaying alpha", "Flipping period[s]", "Voltage[V]"])["Release time[s]"].agg(['mean', 'sem']).reset_index()
 
-# Group by the specified variable and calculate mean and SEM
-grouped = df.groupby(["Decaying alpha", "Flipping period[s]", "Voltage[V]"])["Release time[s]"].agg(['mean', 'sem']).reset_index()
+# The aggregated table is cached next to the summary file (see recordings.load_aggregated)
+grouped = load_aggregated(SUMMARY_FILE, fixed_conditions, aggregate)
 
 alpha_values = sorted(grouped["Decaying alpha"].unique())
 num_alphas = len(alpha_values)
@@ -1,31 +1,87 @@
 import pandas as pd
+import polars as pl
 import numpy as np
 import os
 import re
+import multiprocessing
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)) # shared helpers in Data_analysis
+from filters import ema
+from recordings import scan_recording
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    # Numba is optional, the NumPy/SciPy versions below are used without it
+    HAVE_NUMBA = False
 
 ########### CHANGE HERE ###########
 INPUT_DIR = "data_release_time/"  # Directory containing CSV files
-OUTPUT_FILE = "Data_analysis/release_time_summary.csv"
+OUTPUT_FILE = "Data_analysis/release_time_summary.parquet"
 ####################################
 
 # Constants
 CYCLE_TIME = 0.0015  # seconds
 EMA_ALPHA = 0.07011191019798384  # Exponential Moving Average alpha
+FILENAME_PATTERN = re.compile(r"ReleaseTime3_([\d.]+)kV_flip_([\d.]+)_alpha_([\d.]+)_([\d.]+)\.csv")
+# one row of the summary, NaN when not detected
+RESULT_DTYPE = np.dtype([
+    ("Voltage[V]", "f8"),
+    ("Flipping period[s]", "f8"),
+    #("Decaying flipping period[s]", "f8"),
+    ("Decaying alpha", "f8"),
+    #("Decaying duration[s]", "f8"),
+    ("Release time[s]", "f8"),
+])
+
+if HAVE_NUMBA:
+    @njit(cache=True, fastmath=True)
+    def ema_and_trigger(force, av, alpha, thr):
+        # EMA of force and the first sample where av drops below thr (-1 if never), in one pass
+        # y[n] = alpha*x[n] + (1-alpha)*y[n-1] with y[0] = x[0] (same as ewm(alpha, adjust=False))
+        out = np.empty_like(force)
+        out[0] = force[0]
+        trig = 0 if av[0] < thr else -1
+        one_m = 1.0 - alpha
+        for i in range(1, force.shape[0]):
+            out[i] = alpha * force[i] + one_m * out[i - 1]
+            if trig < 0 and av[i] < thr:
+                trig = i
+        return out, trig
+
+    @njit(cache=True)
+    def first_below_after_peak(x, thr):
+        # peak (first maximum) and the first sample after it below thr, -1 if it never drops
+        p = 0
+        m = x[0]
+        for i in range(1, x.shape[0]):
+            if x[i] > m:
+                m = x[i]
+                p = i
+        for j in range(p + 1, x.shape[0]):
+            if x[j] < thr:
+                return j, m
+        return -1, m
+else:
+    def ema_and_trigger(force, av, alpha, thr):
+        below = av < thr
+        return ema(force, alpha), (int(below.argmax()) if below.any() else -1)
+
+    def first_below_after_peak(x, thr):
+        p = int(x.argmax())
+        below = x[p + 1:] < thr
+        return (p + 1 + int(below.argmax()) if below.any() else -1), x[p]
 
 def detect_release_time(force_data):
-    peak_idx = np.argmax(force_data)
-    release_idx = np.where((force_data < 0.1))[0]
-    # mask the release index to find the first one after the peak
-    masked_release_idx = release_idx[release_idx > peak_idx][0] if len(release_idx[release_idx > peak_idx]) > 0 else None
-    peak_force = force_data[peak_idx]
-    return masked_release_idx, peak_force
+    release_idx, peak_force = first_below_after_peak(force_data, 0.1)
+    return (release_idx if release_idx >= 0 else None), peak_force
 
 def extract_parameters(filename):
     #match1 = re.match(r"ReleaseTime_([\d.]+)kV_flip_([\d.]+)_alpha_([\d.]+)_([\d.]+)\.csv", filename)
     match1 = None
     #match2 = re.match(r"ReleaseTime2_([\d.]+)kV_flip_([\d.]+)_alpha_([\d.]+)_([\d.]+)\.csv", filename)
     match2 = None
-    match3 = re.match(r"ReleaseTime3_([\d.]+)kV_flip_([\d.]+)_alpha_([\d.]+)_([\d.]+)\.csv", filename)
+    match3 = FILENAME_PATTERN.match(filename)
     if match1 or match2 or match3:
         match = match1 or match2 or match3
         voltage = float(match.group(1)) * 1000  # Convert kV to V
@@ -36,58 +92,69 @@ def extract_parameters(filename):
     
     return None, None, None
 
-# List all CSV files in the directory
-results = []
-
-for fname in os.listdir(os.path.join(os.path.dirname(__file__), INPUT_DIR)):
-    if fname.endswith(".csv"):
-        voltage, flip, alpha = extract_parameters(fname)
-        if None in (voltage, flip, alpha):
-            print(f"Skipped: {fname} (Invalid filename format)")
-            continue
-
-        filepath = os.path.join(INPUT_DIR, fname)
-        try:
-            #df = pd.read_csv(filepath)
-            df = pd.read_csv(
-                os.path.join(os.path.dirname(__file__), filepath),
-                parse_dates=["Time(s)"],)
-            analog_voltage = df["Engage_flag"]  # df["analog_voltage"]
-            force_ema = df["Force(N)"].ewm(alpha=EMA_ALPHA, adjust=False).mean()
-            time = df["Time(s)"]
-            off_trigger_time = time[analog_voltage < 0.5].iloc[0]
-
-            release_idx, peak_force = detect_release_time(force_ema)
-            if release_idx is not None:
-                release_time = (time[release_idx] - off_trigger_time).total_seconds()
-                if peak_force < 0.2:
-                    #release_time = None
-                    print(f"Peak force too low in {fname}")
-            else:
-                release_time = None
-                print(f"Release time not detected in {fname}")
-
-            """ if alpha > 0:
-                decay_duration = 0.15
-            else:
-                decay_duration = 0.0 """
-
-            results.append({
-                "Voltage[V]": voltage,
-                "Flipping period[s]": flip,
-                #"Decaying flipping period[s]": decayflip,
-                "Decaying alpha": alpha,
-                #"Decaying duration[s]": decay_duration,
-                "Release time[s]": release_time
-            })
-        except Exception as e:
-            print(f"Error processing {fname}: {e}")
-
-# Save results to CSV
-results_df = pd.DataFrame(results)
-results_df = results_df.sort_values(
-    #by=["Voltage[V]", "Flipping period[s]", "Decaying alpha", "Decaying flipping period[s]"]
-    by=["Voltage[V]", "Flipping period[s]"]
-)
-results_df.to_csv(OUTPUT_FILE, index=False)
-print(f"Summary saved to {OUTPUT_FILE}")
+def process_file(filepath):
+    fname = os.path.basename(filepath)
+    voltage, flip, alpha = extract_parameters(fname)
+    if None in (voltage, flip, alpha):
+        print(f"Skipped: {fname} (Invalid filename format)")
+        return None
+
+    try:
+        #df = pd.read_csv(filepath)
+        df = scan_recording(filepath).select(
+            pl.col("Force(N)").cast(pl.Float32),
+            pl.col("Engage_flag").cast(pl.Float64),
+        ).collect()
+        analog_voltage = df["Engage_flag"].to_numpy()  # df["analog_voltage"]
+        # filtered force and the first sample where the trigger drops below 0.5V
+        force_ema, off_trigger_idx = ema_and_trigger(df["Force(N)"].to_numpy(), analog_voltage, EMA_ALPHA, 0.5)
+        if off_trigger_idx < 0:
+            print(f"Off trigger not detected in {fname}")
+            return None
+
+        release_idx, peak_force = detect_release_time(force_ema)
+        if release_idx is not None:
+            # samples are CYCLE_TIME apart, no need to parse the timestamps
+            release_time = (release_idx - off_trigger_idx) * CYCLE_TIME
+            if peak_force < 0.2:
+                #release_time = None
+                print(f"Peak force too low in {fname}")
+        else:
+            release_time = None
+            print(f"Release time not detected in {fname}")
+
+        """ if alpha > 0:
+            decay_duration = 0.15
+        else:
+            decay_duration = 0.0 """
+
+        return voltage, flip, alpha, (np.nan if release_time is None else release_time)
+    except Exception as e:
+        print(f"Error processing {fname}: {e}")
+        return None
+
+
+def run_release(processes=None):
+    # List all CSV files in the directory, largest first so the pool stays balanced
+    entries = [e for e in os.scandir(os.path.join(os.path.dirname(__file__), INPUT_DIR)) if e.name.endswith(".csv")]
+    entries.sort(key=lambda e: -e.stat().st_size)
+
+    # Each file is independent, so process them in parallel
+    results = np.empty(len(entries), dtype=RESULT_DTYPE)
+    n = 0
+    # spawn, not fork: run_all.py runs Polars threads in this process at the same time, and forking
+    # while its thread pool is busy can deadlock the workers
+    with multiprocessing.get_context("spawn").Pool(processes) as p:
+        for r in p.imap_unordered(process_file, (e.path for e in entries), chunksize=4):
+            if r:
+                results[n] = r
+                n += 1
+
+    # Save results; the plot scripts group (and thereby sort) the table themselves
+    results_df = pd.DataFrame(results[:n])
+    results_df.to_parquet(OUTPUT_FILE, index=False, compression="zstd")
+    print(f"Summary saved to {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    run_release()
@@ -10,6 +10,14 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import os
 import numpy as np
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)) # shared helpers in Data_analysis
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    # Numba is optional, the NumPy/SciPy versions below are used without it
+    HAVE_NUMBA = False
 
 # Constants
 CSV_FILE = "data_release_time/ReleaseTime2_0.12kV_flip_0_alpha_0_4.csv"  # Path to the CSV file
@@ -17,10 +25,53 @@ TITLE = CSV_FILE.split("/")[-1].split(".")[0]
 CYCLE_TIME = 0.0015  # seconds
 EMA_ALPHA = 0.07011191019798384  # Exponential Moving Average alpha
 
+if HAVE_NUMBA:
+    @njit(cache=True, fastmath=True)
+    def ema_and_trigger(force, av, alpha, thr):
+        # EMA of force and the first sample where av drops below thr (-1 if never), in one pass
+        # y[n] = alpha*x[n] + (1-alpha)*y[n-1] with y[0] = x[0] (same as ewm(alpha, adjust=False))
+        out = np.empty_like(force)
+        out[0] = force[0]
+        trig = 0 if av[0] < thr else -1
+        one_m = 1.0 - alpha
+        for i in range(1, force.shape[0]):
+            out[i] = alpha * force[i] + one_m * out[i - 1]
+            if trig < 0 and av[i] < thr:
+                trig = i
+        return out, trig
+
+    @njit(cache=True)
+    def first_below_after_peak(x, thr):
+        # peak (first maximum) and the first sample after it below thr, -1 if it never drops
+        p = 0
+        m = x[0]
+        for i in range(1, x.shape[0]):
+            if x[i] > m:
+                m = x[i]
+                p = i
+        for j in range(p + 1, x.shape[0]):
+            if x[j] < thr:
+                return j, m
+        return -1, m
+else:
+    from filters import ema
+
+    def ema_and_trigger(force, av, alpha, thr):
+        below = av < thr
+        return ema(force, alpha), (int(below.argmax()) if below.any() else -1)
+
+    def first_below_after_peak(x, thr):
+        p = int(x.argmax())
+        below = x[p + 1:] < thr
+        return (p + 1 + int(below.argmax()) if below.any() else -1), x[p]
+
 # reading the CSV file
 df = pd.read_csv(
                 os.path.join(os.path.dirname(__file__), CSV_FILE),
-                parse_dates=["Time(s)"],)
+                engine="pyarrow",
+                usecols=["Time(s)", "Force(N)", "Engage_flag"],
+                parse_dates=["Time(s)"],
+                dtype={"Force(N)": "float32", "Engage_flag": "float64"},)
 
 # Analog voltage for voltage status
 analog_voltage = df["Engage_flag"] #df["analog_voltage"]
@@ -31,31 +82,24 @@ start_time = time[0]
 plot_idx = time < start_time + pd.Timedelta(seconds=1.5)
 
 # apply EMA to estimated_analog_force
-estimated_analog_force_ema_filtered = df["Force(N)"].ewm(alpha=EMA_ALPHA, adjust=False).mean()
+# and detect off trigger time: the trigger time is when the analog voltage is below 0.5V
+estimated_analog_force_ema_filtered, off_trigger_idx = ema_and_trigger(
+    df["Force(N)"].to_numpy(dtype=np.float32), analog_voltage.to_numpy(), EMA_ALPHA, 0.5)
 
 def detect_release_time(force_data, threshold=0.1):
-    # Find the peak force
-    peak_idx = np.argmax(force_data)
-    # list of indices where the force drops below the threshold
-    release_idx = np.where((force_data < threshold))[0]
-
-    # mask the release index to find the first one after the peak
-    masked_release_idx = release_idx[release_idx > peak_idx][0] if len(release_idx[release_idx > peak_idx]) > 0 else None
-    peak_force = force_data[peak_idx]
+    # Find the peak force and the first index after it where the force drops below the threshold
+    release_idx, peak_force = first_below_after_peak(force_data, threshold)
 
-    return masked_release_idx, peak_force
+    return (release_idx if release_idx >= 0 else None), peak_force
 
-# Detect off trigger time
-# is the trigger time when the analog voltage is below 0.5V
-off_triger_time = time[analog_voltage < 0.5].iloc[0]
+off_triger_time = time[off_trigger_idx]
 
 # Detect release time
 release_idx, peak_force = detect_release_time(estimated_analog_force_ema_filtered)
-release_time = time[release_idx] - off_triger_time
 print(f"peak force: {peak_force}")
 
-# Convert release time to seconds
-release_time_seconds = release_time.total_seconds()
+# samples are CYCLE_TIME apart
+release_time_seconds = (release_idx - off_trigger_idx) * CYCLE_TIME
 print(f"Release time: {release_time_seconds:.6f} seconds")
 
 # Plotting the measured force
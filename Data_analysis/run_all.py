@@ -0,0 +1,26 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# the post-processing scripts live in their own directories
+HERE = os.path.dirname(os.path.abspath(__file__))
+for subdir in ("engage_time", "max_holding_force", "release_time"):
+    sys.path.insert(0, os.path.join(HERE, subdir))
+
+from post_process_engage_time import run_engage
+from post_process_max_holding_force import run_max_force
+from post_process_release_time import run_release
+
+
+if __name__ == "__main__":
+    # Run from the repository root, like the individual scripts
+    # The three jobs are independent; split the cores between the two process pools and Polars
+    processes = max(1, (os.cpu_count() or 1) // 3)
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        jobs = [
+            ex.submit(run_engage),
+            ex.submit(run_max_force, processes),
+            ex.submit(run_release, processes),
+        ]
+        for job in jobs:
+            job.result()
@@ -8,12 +8,17 @@ import logging
 import os
 import traceback
 import datetime
+import ctypes
+import gc
+import math
 from readerwriterlock import rwlock
 import LMDrive_Data as LMDD
 import SendData as sendData
 import csv
 import queue
+import subprocess
 import utils
+from SharedBuffers import SeqlockBuffer, SpscRing
 
 
 #----------------------------------------------------------------------------------------------------
@@ -25,6 +30,33 @@ class SdoError(Exception):
     pass
 
 
+#----------------------------------------------------------------------------------------------------
+# Absolute sleep
+class _Timespec(ctypes.Structure):
+    _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+def _abs_sleep_function():
+    """
+    Returns sleep_until(t), which sleeps until the absolute time t of time.perf_counter()
+    with clock_nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME), or None where this is not available.
+    """
+    if time.get_clock_info('perf_counter').implementation != 'clock_gettime(CLOCK_MONOTONIC)':
+        return None
+    try:
+        clock_nanosleep = ctypes.CDLL(None, use_errno=True).clock_nanosleep
+    except (OSError, AttributeError):
+        return None
+    ts = _Timespec()
+    ts_ref = ctypes.byref(ts)
+
+    def sleep_until(t):
+        ts.tv_sec = int(t)
+        ts.tv_nsec = int((t - ts.tv_sec) * 1e9)
+        while clock_nanosleep(time.CLOCK_MONOTONIC, 1, ts_ref, None) == 4: # TIMER_ABSTIME, retry on EINTR
+            pass
+    return sleep_until
+
+
 #----------------------------------------------------------------------------------------------------
 class EtherCATCommunication:
     """
@@ -41,22 +73,29 @@ class EtherCATCommunication:
         no_Monitoring (int): Number of Monitoring channels (0 to 4).
         no_Parameter (int): Number of Parameter channels (0 to 4).
         InputLength (int): Length of input data (is calculated automaticaly)
-        data (mp.Array): Shared array for storing data from slaves.
-        lock (mp.Lock): Lock for synchronizing access to the data array.
-        data_queue (mp.Queue): Queue with data from each cycle - can be activated independently
+        data (SeqlockBuffer): Shared byte buffer with the raw input data from all slaves
+                              (InputLength bytes per slave). Read it with data.read(start, stop).
+        lock (mp.Lock): Lock shared with the application (the data buffer itself is lock-free).
+        data_queue (SpscRing): Shared ring with (timestamp, raw input bytes) of each cycle - can be activated independently
                                with data_queue_ON. (e.g. for Oszylloscope readings)
+                               Holds max_record_time / cycle_time cycles, further cycles are counted as dropped.
+        max_record_time (float): Longest oscilloscope recording in seconds (sizes data_queue).
         data_queue_ON (mp.Event): While active, the data will be saved in data_queue.
                                   (Defaults to OFF immediately after communication is set up)
-        slave_name (manager.list): A list with all the slave names (Types of LinMot Drive)
-        update_queue (mp.Queue): Queue for receiving commands to update slave outputs.
-                                 Will only process the latest entry!
+        slave_name (mp.RawArray): Shared buffer with all the slave names (Types of LinMot Drive),
+                                  SLAVE_NAME_LENGTH bytes per slave. Read it with get_slave_name(i).
+        OutputLength (int): Length of output data (is calculated automaticaly)
+        update_slot (SeqlockBuffer): Shared slot with the packed outputs of all slaves (OutputLength bytes per slave).
+                                     Only the latest command is sent, older ones are overwritten.
         error_queue (mp.Queue): Queue for logging errors.
         info_queue (mp.Queue): Queue for logging informational messages.
         comm_proc (mp.Process): The communication process.
         MAX_CYCLE_OVERRUN (int): Maximum allowed cycle time overruns before stopping communication.
         MAX_SLAVE_COMM_ATTEMPTS (int): Maximum atempts to esablish communication with the slave
                                        before terminating the communication
-        Activate_LMDrive_Data (bool): Deactivate data and update_queue and save all Data in
+        STATE_CHECK_INTERVAL (int): Cycles between slave state checks while the working counter is as expected
+        STOP_CHECK_INTERVAL (int): Cycles between checks of stop_event in the communication loop
+        Activate_LMDrive_Data (bool): Deactivate data and update_slot and save all Data in
                                       lm_drive_data_dict, where the user can access them.
                                       Results in lower performance!
         lm_drive_data_dict (dict): Dictionary with all necessery motor information
@@ -64,8 +103,11 @@ class EtherCATCommunication:
         
     """
     
+    SLAVE_NAME_LENGTH: int = 64 # Bytes reserved per slave name
+
     def __init__(self, adapter_id:str, noDev:int, cycle_time:float, lock:mp.Lock, no_Monitoring:int=0, no_Parameter:int=0, mp_logging:int=0,
-                 ozsi_on:bool=True, record_latency:bool=False):
+                 ozsi_on:bool=True, record_latency:bool=False, core_pin:int=None, rt_prio:int=80,
+                 tune_nic:bool=False, max_record_time:float=60.0, latency_capacity:int=65536):
         """
         Initializes the EtherCATCommunication class with the given parameters.
 
@@ -80,36 +122,65 @@ class EtherCATCommunication:
                                           Might reduce performance!
             mp_logging (int, optional): The logging level for multiprocessing. Defaults to 0.
                                         Info: 20; Error: 40
+            core_pin (int, optional): CPU core for the communication process. If set, the process is pinned
+                                      to this core and runs with real-time priority. Defaults to None (off).
+            rt_prio (int, optional): SCHED_FIFO priority (1 to 99) used with core_pin on Linux. Defaults to 80.
+            tune_nic (bool, optional): If True, interrupt coalescing and segmentation offloads of the adapter
+                                       are switched off with ethtool before the master is opened (Linux, root).
+                                       Defaults to False.
+            max_record_time (float, optional): Longest oscilloscope recording in seconds. data_queue is sized
+                                               to hold this many seconds of cycles. Defaults to 60.0.
+            latency_capacity (int, optional): Number of cycle latencies kept until stop() saves them with record_latency.
+                                              Further cycles are counted as dropped. Defaults to 65536 (~98s at 1.5ms).
         """
         self.adapter_id = adapter_id
         self.noDev = noDev
         self.cycle_time = cycle_time
         self.mp_log = mp_logging
+        self.core_pin = core_pin
+        self.rt_prio = rt_prio
+        self.tune_nic = tune_nic
+        self.max_record_time = max_record_time
         self.master = None
         self.stop_event = mp.Event()
         self.stop_event.set() # Default to Set
         self.no_Parameter = no_Parameter
         self.no_Monitoring = no_Monitoring
         self.InputLength = 18 + 8 + (4 * self.no_Monitoring)  #18 + 8 + (4 * self.no_Monitoring)
-        self.data = mp.Array('i', noDev*self.InputLength) # Queue for data (Structure: TxData_Default_Inputs) ########################
+        self.OutputLength = 28 + 4 + (2 * self.no_Parameter)  #28 + 4 + (2 * self.no_Parameter)
+        self.data = SeqlockBuffer(noDev*self.InputLength) # Raw input bytes of all slaves (Structure: TxData_Default_Inputs)
         self.lock = lock
-        self.data_queue = mp.Queue() # Queue for data
+        self.data_queue = SpscRing(noDev*self.InputLength, capacity=math.ceil(max_record_time/cycle_time)) # Ring for data (max_record_time)
         self.data_queue_ON = mp.Event() # Putting data of each cycle in self.data_queue (e.g. for Oscyloscope readings)
-        manager = mp.Manager()
-        self.slave_name = manager.list([None] * noDev)  # Initialize slave_name list with Manager
-        self.update_queue = mp.Queue() # Queue for commands (Structure: Output Data)
+        self.slave_name = mp.RawArray(ctypes.c_char, self.SLAVE_NAME_LENGTH*noDev) # Names of all slaves, written once in setup_comm
+        self.update_slot = SeqlockBuffer(noDev*self.OutputLength) # Latest command for all slaves (Structure: Output Data)
         self.error_queue = mp.Queue()# Queue for error (Level 40)
         self.info_queue = mp.Queue()# Queue for info (Level 20)
         self.comm_proc = None
+        self._queues_closed = False # Set by stop(), a closed mp.Queue cannot be read anymore
         
         # Constant
         self.MAX_CYCLE_OVERRUN: int = 20
         self.MAX_SLAVE_COMM_ATTEMPTS: int = 10
+        self.STATE_CHECK_INTERVAL: int = 64 # Cycles between slave state checks while the working counter is correct
+        self.STOP_CHECK_INTERVAL: int = 8 # Cycles between checks of stop_event (is_set() goes through a semaphore)
+
+        # PDO assignment of the sync managers (0x1C12: Output, 0x1C13: Input), precomputed as SDO writes
+        pdo_assign = {0x1C12: [0x1700, 0x1708] + [0x1728+i for i in range(self.no_Parameter)], # Default Output, Config Module Outputs, Par Channels
+                      0x1C13: [0x1B00, 0x1B08] + [0x1B28+i for i in range(self.no_Monitoring)]} # Default Input, Config Module Inputs, Mon Channels
+        # Complete access: whole object in one transfer (entry count, subindex 0 padded to 16 bit, then one UINT16 per PDO)
+        self._pdo_ca = [(index, struct.pack('<Bx' + 'H'*len(pdos), len(pdos), *pdos)) for index, pdos in pdo_assign.items()]
+        # Fallback for slaves without complete access: (index, subindex, value), entry count last
+        self._pdo_writes = []
+        for index, pdos in pdo_assign.items():
+            self._pdo_writes += [(index, 1+i, pdo.to_bytes(2, 'little')) for i, pdo in enumerate(pdos)]
+            self._pdo_writes += [(index, 0, bytes([len(pdos)]))]
 
         # Flag to evaluate the latency
         self.record_latency = record_latency
+        self.latency_capacity = latency_capacity
         self.evaluate_latency = mp.Event() # Default to False
-        self.latency_queue = mp.Queue() # Queue for latency data
+        self.latency_queue = SpscRing(8, capacity=latency_capacity) # Ring for (timestamp, latency as float64)
 
         # Flag to activate the oscilloscope recording
         self.ozsi_on = ozsi_on
@@ -117,6 +188,66 @@ class EtherCATCommunication:
         self.ozsi_timestamp_list = [] # List to store timestamps
         
         
+    def get_slave_name(self, i:int):
+        """
+        Returns the name of slave i, or None if it has not been read.
+        """
+        name = self.slave_name[i*self.SLAVE_NAME_LENGTH:(i+1)*self.SLAVE_NAME_LENGTH].rstrip(b'\0')
+        return name.decode('utf-8', errors='replace') if name else None
+
+    def set_realtime(self):
+        """
+        Pins the calling process to core_pin, raises it to real-time priority and locks its memory.
+        Each step is best effort: missing privileges are reported and the step is skipped.
+        """
+        if os.name == 'nt':
+            from ctypes import wintypes
+            kernel32 = ctypes.WinDLL('kernel32')
+            # Without prototypes ctypes passes and returns C ints: the mask (DWORD_PTR) and the handles are pointer-sized
+            kernel32.GetCurrentThread.restype = wintypes.HANDLE
+            kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+            kernel32.SetThreadAffinityMask.argtypes = [wintypes.HANDLE, ctypes.c_size_t]
+            kernel32.SetThreadAffinityMask.restype = ctypes.c_size_t
+            kernel32.SetPriorityClass.argtypes = [wintypes.HANDLE, wintypes.DWORD]
+            kernel32.SetPriorityClass.restype = wintypes.BOOL
+            if not kernel32.SetThreadAffinityMask(kernel32.GetCurrentThread(), 1 << self.core_pin):
+                self.info_queue.put(f'Could not pin communication to core {self.core_pin}.') if self.mp_log >= 20 else None
+            if not kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), 0x00000100): # REALTIME_PRIORITY_CLASS
+                self.info_queue.put('Could not raise the priority class.') if self.mp_log >= 20 else None
+            return
+        try:
+            os.sched_setaffinity(0, {self.core_pin})
+        except OSError as e:
+            self.info_queue.put(f'Could not pin communication to core {self.core_pin}: {e}') if self.mp_log >= 20 else None
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(self.rt_prio))
+        except OSError as e:
+            self.info_queue.put(f'Could not set SCHED_FIFO priority: {e}') if self.mp_log >= 20 else None
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.mlockall(1 | 2) != 0: # MCL_CURRENT | MCL_FUTURE
+            self.info_queue.put(f'Could not lock memory: {os.strerror(ctypes.get_errno())}') if self.mp_log >= 20 else None
+
+    def setup_nic(self):
+        """
+        Switches off interrupt coalescing and GRO/LRO/TSO/GSO on the adapter, so that frames are
+        sent and received without delay. Linux only and best effort (needs ethtool and root).
+        The settings stay active until they are changed back or the adapter is reset.
+        """
+        if os.name == 'nt':
+            return
+        commands = [
+            ['ethtool', '-C', self.adapter_id, 'adaptive-rx', 'off', 'rx-usecs', '0', 'tx-usecs', '0'],
+            ['ethtool', '-K', self.adapter_id, 'gro', 'off', 'lro', 'off', 'tso', 'off', 'gso', 'off'],
+        ]
+        for command in commands:
+            try:
+                result = subprocess.run(command, capture_output=True, text=True)
+            except OSError as e:
+                self.info_queue.put(f'NIC tuning skipped: {e}') if self.mp_log >= 20 else None
+                return
+            if result.returncode != 0:
+                self.info_queue.put(f'NIC tuning "{" ".join(command)}" failed: {result.stderr.strip()}') if self.mp_log >= 20 else None
+
     def check_values(self):
         """
         Check input values.
@@ -128,10 +259,21 @@ class EtherCATCommunication:
             raise ValueError(f"noDev {self.noDev} is out of range! Must be greater than 0.")
         if not(0.0001 <= self.cycle_time <= 1):
             raise ValueError(f"cycle_time {self.cycle_time} is out of range! Must be between 0.0001s and 1s.")
+        if not(0 < self.latency_capacity):
+            raise ValueError(f"latency_capacity {self.latency_capacity} is out of range! Must be greater than 0.")
+        if not(0 < self.max_record_time):
+            raise ValueError(f"max_record_time {self.max_record_time} is out of range! Must be greater than 0.")
         if not(0 <= self.no_Monitoring <= 4):
             raise ValueError(f"no_Monitoring {self.no_Monitoring} is out of range! Must be between {0} and {4}.")
         if not(0 <= self.no_Parameter <= 4):
             raise ValueError(f"no_Parameter {self.no_Parameter} is out of range! Must be between {0} and {4}.")
+        if self.core_pin is not None:
+            # On Windows the core is set in an affinity mask of pointer size (one processor group)
+            max_core = os.cpu_count() if os.name != 'nt' else min(os.cpu_count(), 8*ctypes.sizeof(ctypes.c_size_t))
+            if not(0 <= self.core_pin < max_core):
+                raise ValueError(f"core_pin {self.core_pin} is out of range! Must be between {0} and {max_core-1}.")
+        if not(1 <= self.rt_prio <= 99):
+            raise ValueError(f"rt_prio {self.rt_prio} is out of range! Must be between {1} and {99}.")
 
     def setup_comm(self):
         """
@@ -142,19 +284,23 @@ class EtherCATCommunication:
         """
         try:
             # Setup EtherCAT master
+            if self.tune_nic:
+                self.setup_nic()
             self.master = pysoem.Master()
             self.master.open(self.adapter_id)
-            if self.master.config_init() != self.noDev:
-                raise SlaveCountError(f'Expected {self.noDev} devices, but found {self.master.config_init()}')
+            slave_count = self.master.config_init()
+            if slave_count != self.noDev:
+                raise SlaveCountError(f'Expected {self.noDev} devices, but found {slave_count}')
             
-            # Change slave state to PREOP_STATE
+            # Change slave state to PREOP_STATE (master.write_state() addresses all slaves at once)
+            self.master.state = pysoem.PREOP_STATE
+            self.master.write_state()
+
             for i, slave in enumerate(self.master.slaves, start=0):
-                self.master.state = pysoem.PREOP_STATE
-                self.master.write_state()
-                
                 # Get the Name of each Slave
                 try:
-                    self.slave_name[i] = slave.sdo_read(0x1008, 0).decode('utf-8') # Reading the device name from the Object Dictionary
+                    name = slave.sdo_read(0x1008, 0)[:self.SLAVE_NAME_LENGTH] # Reading the device name from the Object Dictionary
+                    self.slave_name[i*self.SLAVE_NAME_LENGTH:(i+1)*self.SLAVE_NAME_LENGTH] = name.ljust(self.SLAVE_NAME_LENGTH, b'\0')
                 except pysoem.SdoError as e:
                     self.error_queue.put(f'{datetime.datetime.now()} - Slave name not found: {e}') if self.mp_log >= 40 else None
                     
@@ -164,48 +310,12 @@ class EtherCATCommunication:
                     slave.sdo_write(0x1C13, 0x00, b'\x00') # Clear Input
                     slave.sdo_write(0x1A20, 0x00, b'\x00')
                     slave.sdo_write(0x1620, 0x00, b'\x00')
-                    # Output
-                    slave.sdo_write(0x1C12, 1, (0x1700).to_bytes(2, 'little')) # Default Output
-                    slave.sdo_write(0x1C12, 2, (0x1708).to_bytes(2, 'little')) # Config Module Outputs
-                    if self.no_Parameter == 0:
-                        slave.sdo_write(0x1C12, 0, b'\x02')
-                    if self.no_Parameter >= 1:
-                        slave.sdo_write(0x1C12, 3, (0x1728).to_bytes(2, 'little')) # Par Channel 1 (Output)
-                        if self.no_Parameter == 1:
-                            slave.sdo_write(0x1C12, 0, b'\x03')
-                    if self.no_Parameter >= 2:
-                        slave.sdo_write(0x1C12, 4, (0x1729).to_bytes(2, 'little')) # Par Channel 2 (Output)
-                        if self.no_Parameter == 2:
-                            slave.sdo_write(0x1C12, 0, b'\x04')
-                    if self.no_Parameter >= 3:
-                        slave.sdo_write(0x1C12, 5, (0x172A).to_bytes(2, 'little')) # Par Channel 3 (Output)
-                        if self.no_Parameter == 3:
-                            slave.sdo_write(0x1C12, 0, b'\x05')
-                    if self.no_Parameter >= 4:
-                        slave.sdo_write(0x1C12, 6, (0x172B).to_bytes(2, 'little')) # Par Channel 4 (Output)
-                        if self.no_Parameter == 4:
-                            slave.sdo_write(0x1C12, 0, b'\x06')
-                    # Input
-                    slave.sdo_write(0x1C13, 1, (0x1B00).to_bytes(2, 'little')) # Default Input
-                    slave.sdo_write(0x1C13, 2, (0x1B08).to_bytes(2, 'little')) # Config Module Inputs
-                    if self.no_Monitoring == 0:
-                        slave.sdo_write(0x1C13, 0, b'\x02')
-                    if self.no_Monitoring >= 1:
-                        slave.sdo_write(0x1C13, 3, (0x1B28).to_bytes(2, 'little')) # Mon Channel 1 (Input)
-                        if self.no_Monitoring == 1:
-                            slave.sdo_write(0x1C13, 0, b'\x03')
-                    if self.no_Monitoring >= 2:
-                        slave.sdo_write(0x1C13, 4, (0x1B29).to_bytes(2, 'little')) # Mon Channel 2 (Input)
-                        if self.no_Monitoring == 2:
-                            slave.sdo_write(0x1C13, 0, b'\x04')
-                    if self.no_Monitoring >= 3:
-                        slave.sdo_write(0x1C13, 5, (0x1B2A).to_bytes(2, 'little')) # Mon Channel 3 (Input)
-                        if self.no_Monitoring == 3:
-                            slave.sdo_write(0x1C13, 0, b'\x05')
-                    if self.no_Monitoring >= 4:
-                        slave.sdo_write(0x1C13, 6, (0x1B2B).to_bytes(2, 'little')) # Mon Channel 4 (Input)
-                        if self.no_Monitoring == 4:
-                            slave.sdo_write(0x1C13, 0, b'\x06')
+                    try:
+                        for index, value in self._pdo_ca:
+                            slave.sdo_write(index, 0, value, True) # Complete access
+                    except pysoem.SdoError:
+                        for index, subindex, value in self._pdo_writes:
+                            slave.sdo_write(index, subindex, value)
                     
                 except pysoem.pysoem.SdoError as e:
                     raise SdoError(f'{e} \n    ErrorNote: This error occurs at the startup of the Master/Slave system. '
@@ -233,6 +343,9 @@ class EtherCATCommunication:
         """
         Main communication process that handles the EtherCAT communication cycle.
         """
+        if self.core_pin is not None:
+            self.set_realtime()
+
         # Setup the EtherCAT communication
         slaves = self.setup_comm()
         if (slaves is None) or (None in slaves):
@@ -245,76 +358,118 @@ class EtherCATCommunication:
         self.data_queue_ON.clear() # Default Oszi recording off!
         self.stop_event.clear() # Enable Communication
         self.evaluate_latency.clear() # Default to False
-        lock_timeout = max(self.cycle_time-0.010, 0.004)
         
         slave_state = [0]*self.noDev
+        expected_wkc = self.master.expected_wkc
+        cycle_no = 0
+
+        # Preallocated buffer for the inputs of all slaves, refilled every cycle
+        payload = bytearray(self.noDev*self.InputLength)
+        payload_view = memoryview(payload) # Slice assignment on the view raises instead of resizing
+        input_slices = [slice(i*self.InputLength, (i+1)*self.InputLength) for i in range(self.noDev)]
+        output_slices = [slice(i*self.OutputLength, (i+1)*self.OutputLength) for i in range(self.noDev)]
+        update_seq = 0 # Sequence number of the last command sent to the slaves
+
+        # Objects created during setup live until the end; keep them out of the cyclic GC scans
+        gc.collect()
+        gc.freeze()
+
+        # On Windows time.sleep has a granularity of ~15 ms unless the timer resolution is raised
+        winmm = ctypes.WinDLL('winmm') if os.name == 'nt' else None
+        if winmm is not None:
+            winmm.timeBeginPeriod(1)
+        
+        # Bind the attributes and methods used every cycle to locals (saves the lookups in the loop)
+        perf_counter = time.perf_counter
+        sleep = time.sleep
+        sleep_until = _abs_sleep_function() # None on Windows
+        cycle_time = self.cycle_time
+        stop_is_set = self.stop_event.is_set
+        read_state = self.master.read_state
+        send_processdata = self.master.send_processdata
+        receive_processdata = self.master.receive_processdata
+        write_data = self.data.write
+        ozsi_on = self.ozsi_on
+        oszi_is_set = self.data_queue_ON.is_set
+        put_oszi = self.data_queue.put_nowait
+        read_update = self.update_slot.read_if_newer
+        record_latency = self.record_latency
+        latency_is_set = self.evaluate_latency.is_set
+        put_latency = self.latency_queue.put_nowait
+        pack_latency = struct.Struct('<d').pack
+        state_check_interval = self.STATE_CHECK_INTERVAL
+        stop_check_interval = self.STOP_CHECK_INTERVAL
+        OP_STATE = pysoem.OP_STATE
         
         try:
-            while not self.stop_event.is_set():
-                start_time = time.perf_counter()
+            deadline = perf_counter() # Absolute deadline of the current cycle
+            wall_offset = time.time() - deadline # Converts perf_counter() to wall clock time for the timestamps
+            while cycle_no % stop_check_interval or not stop_is_set(): # Poll the stop event only every few cycles
+                start_time = perf_counter()
+                deadline += cycle_time
                 
-                # Check if connection to slave is present
-                for i in range(self.noDev):
-                    slave_state[i] = (slave_state[i] + 1) * (not slaves[i].state_check(pysoem.OP_STATE, 500) == 8)
-                    if slave_state[i] >= 8: # Can be deleted
-                        self.info_queue.put(f'{datetime.datetime.now()} - Connection to Salve {i} lost {slave_state[i]} times in a row') if self.mp_log >= 20 else None # Can be deleted
-                    if slave_state[i] >= self.MAX_SLAVE_COMM_ATTEMPTS:
-                        raise RuntimeError(f'Slave {i} is not in Operational State anymore.')
-
                 # Send/Receive process data
-                self.master.send_processdata()
-                self.master.receive_processdata(2000)
+                send_processdata()
+                wkc = receive_processdata(2000)
+
+                # Check if connection to slave is present: on a working counter mismatch, otherwise only now and then
+                if wkc != expected_wkc or cycle_no % state_check_interval == 0:
+                    read_state() # Blocking broadcast round-trip on the bus (state of all slaves), hence only on demand
+                    for i in range(self.noDev):
+                        slave_state[i] = (slave_state[i] + 1) * (slaves[i].state != OP_STATE)
+                        if slave_state[i] >= 8: # Can be deleted
+                            self.info_queue.put(f'{datetime.datetime.now()} - Connection to Salve {i} lost {slave_state[i]} times in a row') if self.mp_log >= 20 else None # Can be deleted
+                        if slave_state[i] >= self.MAX_SLAVE_COMM_ATTEMPTS:
+                            raise RuntimeError(f'Slave {i} is not in Operational State anymore.')
+                cycle_no += 1
 
-                # Collect data from all slaves
-                all_data = [input_data for slave in slaves for input_data in slave.input]
+                # Collect data from all slaves (raw bytes, InputLength per slave)
+                for slave, input_slice in zip(slaves, input_slices):
+                    payload_view[input_slice] = slave.input
         
-                # Put the received data into the data array
-                if self.lock.acquire(timeout=lock_timeout):
-                    self.data[:] = all_data[:]
-                    self.lock.release()
-                if self.ozsi_on and self.data_queue_ON.is_set():
-                    #self.data_queue.put(all_data)
+                # Put the received data into the data array (lock-free, readers retry on a torn copy)
+                write_data(payload)
+                if ozsi_on and oszi_is_set():
                     try:
-                        #self.data_queue.put_nowait(all_data)
-                        self.data_queue.put_nowait((datetime.datetime.now(), all_data))
+                        put_oszi(payload, start_time + wall_offset) # Timestamp: start of the cycle
                     except queue.Full:
-                        self.error_queue.put('data_queue is full. Skipping this cycle.') if self.mp_log >= 30 else None
+                        pass # Counted by data_queue, reported by utils.save_oszi after the recording
 
-                # Process the update queue if new Rx data is available
-                if not self.update_queue.empty():
+                # Send the latest command if a new one was written (never waits for the writer; retried next cycle)
+                update_seq, new_rx_data = read_update(update_seq)
+                if new_rx_data is not None:
                     try:
-                        while not self.update_queue.empty(): # Empty queue to get the latest value from queue
-                            new_rx_data = self.update_queue.get_nowait()
-                        if isinstance(new_rx_data, list) and len(new_rx_data) == len(slaves):
-                            for i, rx_data_instance in enumerate(new_rx_data):
-                                slaves[i].output = rx_data_instance
+                        for slave, output_slice in zip(slaves, output_slices):
+                            slave.output = new_rx_data[output_slice]
                     except Exception as e:
                         self.error_queue.put(f'{datetime.datetime.now()} - Unexpected error while Sending Data: {e}') if self.mp_log >= 40 else None
-                    
 
-                if self.record_latency and self.evaluate_latency.is_set():
+                if record_latency and latency_is_set():
                     try:
-                        latency = time.perf_counter() - start_time
-                        self.latency_queue.put_nowait({
-                        'timestamp': datetime.datetime.now(),
-                        'latency': latency,
-                    })
+                        put_latency(pack_latency(perf_counter() - start_time), start_time + wall_offset)
                     except queue.Full:
-                        self.error_queue.put('data_queue is full. Skipping this cycle.') if self.mp_log >= 30 else None
+                        pass # Counted by latency_queue, reported by utils.save_latency_to_csv
                 
-                # Handle cycle time
-                elapsed_time = time.perf_counter() - start_time
-                sleep_time = self.cycle_time - elapsed_time - 0.0004
+                # Handle cycle time: sleep until the absolute deadline, or (without clock_nanosleep)
+                # sleep until shortly before it and spin until it is reached
+                remaining = deadline - perf_counter()
                     
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
+                if remaining > 0:
+                    if sleep_until is not None:
+                        sleep_until(deadline)
+                    else:
+                        if remaining > 0.001:
+                            sleep(remaining - 0.0005)
+                        while perf_counter() < deadline:
+                            pass
                     overrun_count = 0
                 else:
                     overrun_count += 1
                     self.error_queue.put(f'{datetime.datetime.now()} - Cycle time overrun: '
-                                         f'No. {overrun_count} with {sleep_time}s') if self.mp_log >= 40 else None
+                                         f'No. {overrun_count} with {remaining}s') if self.mp_log >= 40 else None
                     if overrun_count > self.MAX_CYCLE_OVERRUN:
                         raise RuntimeError(f'Cycle time repeatedly ({self.MAX_CYCLE_OVERRUN}) overrun, stopping communication.')
+                    deadline = perf_counter() # Restart the schedule instead of trying to catch up
         except KeyboardInterrupt:
             self.info_queue.put('Communication interrupted by user.') if self.mp_log >= 20 else None
             self.stop_event.set()
@@ -322,6 +477,8 @@ class EtherCATCommunication:
             self.error_queue.put(f'{datetime.datetime.now()} - Unexpected error: {e}') if self.mp_log >= 40 else None
         finally:
             self.stop_event.set()
+            if winmm is not None:
+                winmm.timeEndPeriod(1)
             self.info_queue.put('Setting master to SAFEOP_STATE and closing master.') if self.mp_log >= 20 else None
             self.master.state = pysoem.SAFEOP_STATE
             self.master.write_state()
@@ -345,7 +502,7 @@ class EtherCATCommunication:
     
     def stop(self):
         """
-        Stops the EtherCAT communication process and clears all queues safely.
+        Stops the EtherCAT communication process and closes all queues.
         """
         if self.record_latency:
             logging.info("Saving latency data to CSV file.")
@@ -356,40 +513,39 @@ class EtherCATCommunication:
             logging.info("Setting stop event.")
             self.stop_event.set()
 
-            # Try to join the communication process with timeout
-            self.comm_proc.join(timeout=2)
+            # Try to join the communication process with timeout. Keep emptying the queues meanwhile:
+            # its feeder thread can only flush the last messages (and let the process exit) into a pipe with room
+            deadline = time.monotonic() + 2
+            while self.comm_proc.is_alive() and time.monotonic() < deadline:
+                self.drain_messages()
+                self.comm_proc.join(timeout=0.05)
 
             if self.comm_proc.is_alive():
-                logging.warning("Communication process did not terminate. Attempting to clear queues.")
-
-                # Helper function to safely drain a queue
-                def drain_queue(q, name):
-                    count = 0
-                    while not q.empty():
-                        try:
-                            q.get_nowait()
-                            count += 1
-                        except Exception as e:
-                            logging.warning(f"Failed to get from {name}: {e}")
-                            break
-                    logging.info(f"Cleared {count} entries from {name}.")
-
-                # Drain all queues
-                drain_queue(self.error_queue, "error_queue")
-                drain_queue(self.info_queue, "info_queue")
-                drain_queue(self.update_queue, "update_queue")
-                drain_queue(self.data_queue, "data_queue")
-
-                # Give the process another chance to terminate cleanly
+                logging.error("Communication process still alive. Forcefully terminating.")
+                self.comm_proc.terminate()
                 self.comm_proc.join(timeout=1)
 
-                if self.comm_proc.is_alive():
-                    logging.error("Communication process still alive. Forcefully terminating.")
-                    self.comm_proc.terminate()
-                    self.comm_proc.join(timeout=1)
-
             if self.comm_proc.is_alive():
                 logging.error("Communication process did not terminate even after forceful termination.")
             else:
                 logging.info("EtherCAT communication process stopped successfully.")
 
+        # Nothing is written to the queues anymore: log what is left, then close them (once, stop() may be called again)
+        if not self._queues_closed:
+            self.drain_messages()
+            for q in (self.error_queue, self.info_queue):
+                q.close()
+                q.join_thread()
+            self._queues_closed = True
+
+    def drain_messages(self):
+        """
+        Logs and removes all messages left in error_queue and info_queue.
+        """
+        for q, log in ((self.error_queue, logging.error), (self.info_queue, logging.info)):
+            while True:
+                try:
+                    log(q.get_nowait())
+                except queue.Empty:
+                    break
+
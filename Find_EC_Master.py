@@ -35,9 +35,7 @@ def create_window(adapters):
     instruction_label = tk.Label(frame, text="Select your EtherCAT Master")
     instruction_label.pack(pady=5)
 
-    for adapter in adapters:
-        adapter_name = adapter.name
-        adapter_desc = adapter.desc.decode('utf-8')
+    for adapter_name, adapter_desc in adapter_dict.items():
         radio_button = tk.Radiobutton(frame, text=adapter_desc, variable=selected_adapter, value=adapter_name, anchor="w")
         radio_button.pack(fill="x", padx=5, pady=2)
 
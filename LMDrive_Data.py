@@ -1,10 +1,46 @@
 import struct
-import ctypes
+
+# Precompiled PDO layouts, indexed by the number of monitoring / parameter channels (0 to 4).
+# Kept at module level (not on the instance) so LMDrive_Data stays picklable.
+# The inputs are decoded with signed / float codes, so no conversion is needed after unpacking:
+# demand_curr and monitoring channels 1-3 are 16-bit signed values in a 32-bit slot ('hxx'),
+# monitoring channel 4 is an IEEE 754 float ('f').
+_MON_CH_CODES = ('hxx', 'hxx', 'hxx', 'f')
+_INPUT_STRUCTS = [struct.Struct('<HHHiihxxHHi' + ''.join(_MON_CH_CODES[:n])) for n in range(5)]
+_OUTPUT_STRUCTS = [struct.Struct('<HHHHHHHHHHHHHHi' + 'H' * n) for n in range(5)]
+_OUTPUT_PAR_STRUCTS = [struct.Struct('<HHHHHHHHHHHHHHi' + 'i' * n) for n in range(5)]
+
+# Dictionary keys of the monitoring / parameter channels, built once
+_MON_CH_KEYS = tuple(f'mon_ch{i}' for i in range(1, 5))
+_PAR_CH_KEYS = tuple(f'par_ch{i}' for i in range(1, 5))
 
 class LMDrive_Data:
     """Class for LinMot drive data
     Includes communication data, motor config parameters and scaled drive status.
     """
+    # Template for format_status(), built once
+    _STATUS_FORMAT = ("Operation_Enabled: {s[operation_enabled]}, "
+                      "SwitchOn_Locked: {s[switch_on_locked]}, "
+                      "Homed: {s[homed]}, "
+                      "Motion_Active: {s[motion_active]}, "
+                      "Jogging: {s[jogging]}, "
+                      "Warning: {s[warning]}, "
+                      "Error: {s[error]}, "
+                      "Error_Code: {s[error_code]}, "
+                      "Demand_Position: {s[demand_position]}, "
+                      "Actual_Position: {s[actual_position]}, "
+                      "Difference_Position: {s[difference_position]}, "
+                      "Actual_Current: {s[actual_current]}, "
+                      "Measured_Force: {s[measured_force]}, "
+                      "Analog_Diff_Voltage: {s[analog_diff_voltage]}, "
+                      "Analog_Diff_Voltage_Filtered: {s[analog_diff_voltage_filtered]}, "
+                      "Analog_Voltage: {s[analog_voltage]}, "
+                      "Estimated_Force: {s[estimated_force_analog_filtered]}, "
+                      "MonCh1: {i[mon_ch1]}, "
+                      "MonCh2: {i[mon_ch2]}, "
+                      "MonCh3: {i[mon_ch3]}, "
+                      "MonCh4: {i[mon_ch4]} ")
+
     def __init__(self, num_mon_channels, num_par_channels):
         self.num_mon_ch = num_mon_channels  # Number of monitoring channels
         self.num_par_ch = num_par_channels  # Number of parameter channels
@@ -84,52 +120,59 @@ class LMDrive_Data:
         """
         Updates calculated fields based on current input values and configuration.
         """
+        inputs, status, config = self.inputs, self.status, self.config
+        status_word = inputs['status_word']
+        state_var = inputs['state_var']
+
         # Update `unit_scale` in config
-        self.config['unit_scale'] = self.config['pos_scale_numerator'] / self.config['pos_scale_denominator']
+        unit_scale = config['pos_scale_numerator'] / config['pos_scale_denominator']
+        config['unit_scale'] = unit_scale
 
         # Update status fields based on inputs
-        self.status['operation_enabled'] = bool(self.inputs['status_word'] & 0x0001)  # Bit 0
-        self.status['switch_on_locked'] = bool(self.inputs['status_word'] & 0x0040)   # Bit 6
-        self.status['homed'] = bool(self.inputs['status_word'] & 0x0800)             # Bit 11
-        self.status['motion_active'] = bool(self.inputs['status_word'] & 0x2000)     # Bit 13
-        self.status['warning'] = bool(self.inputs['status_word'] & 0x0080)           # Bit 7
-        self.status['error'] = bool(self.inputs['status_word'] & 0x0008)             # Bit 3
+        status['operation_enabled'] = bool(status_word & 0x0001)  # Bit 0
+        status['switch_on_locked'] = bool(status_word & 0x0040)   # Bit 6
+        status['homed'] = bool(status_word & 0x0800)             # Bit 11
+        status['motion_active'] = bool(status_word & 0x2000)     # Bit 13
+        status['warning'] = bool(status_word & 0x0080)           # Bit 7
+        status['error'] = bool(status_word & 0x0008)             # Bit 3
 
         # Check error state and set error code
-        if self.inputs['state_var'] & 0xFF00 == 0x0400:  # Error state
-            self.status['error_code'] = self.inputs['state_var'] & 0x00FF
+        if state_var & 0xFF00 == 0x0400:  # Error state
+            status['error_code'] = state_var & 0x00FF
         else:
-            self.status['error_code'] = 0x00
+            status['error_code'] = 0x00
 
         # Calculate scaled positions and current
-        self.status['demand_position'] = ctypes.c_int32(self.inputs['demand_pos']).value / self.config['unit_scale']
-        self.status['actual_position'] = ctypes.c_int32(self.inputs['actual_pos']).value / self.config['unit_scale']
-        self.status['difference_position'] = round(self.status['demand_position'] - self.status['actual_position'], 4)
-        self.status['actual_current'] = ctypes.c_int16(self.inputs['demand_curr']).value / 1000.0
+        demand_position = inputs['demand_pos'] / unit_scale
+        actual_position = inputs['actual_pos'] / unit_scale
+        status['demand_position'] = demand_position
+        status['actual_position'] = actual_position
+        status['difference_position'] = round(demand_position - actual_position, 4)
+        status['actual_current'] = inputs['demand_curr'] / 1000.0
 
         # measured force
-        self.status['measured_force'] = ctypes.c_int32(self.inputs['mon_ch1']).value * self.config['fc_force_scale']  # N
+        status['measured_force'] = inputs['mon_ch1'] * config['fc_force_scale']  # N
 
         # update analog diff voltage
-        self.status['analog_diff_voltage'] = ctypes.c_int32(self.inputs['mon_ch2']).value * self.config['analog_diff_voltage_scale']  # V
+        analog_diff_voltage_scale = config['analog_diff_voltage_scale']
+        status['analog_diff_voltage'] = inputs['mon_ch2'] * analog_diff_voltage_scale  # V
         # update filtered analog diff voltage
-        self.status['analog_diff_voltage_filtered'] = ctypes.c_float(self.inputs['mon_ch4']).value * self.config['analog_diff_voltage_scale']  # V
+        analog_diff_voltage_filtered = inputs['mon_ch4'] * analog_diff_voltage_scale  # V
+        status['analog_diff_voltage_filtered'] = analog_diff_voltage_filtered
 
         # update analog voltage
-        self.status['analog_voltage'] = ctypes.c_int32(self.inputs['mon_ch3']).value * self.config['analog_voltage_scale']  # V
+        status['analog_voltage'] = inputs['mon_ch3'] * config['analog_voltage_scale']  # V
 
         # update estimated force
-        self.status['estimated_force_analog_filtered'] = self.status['analog_diff_voltage_filtered'] * self.config['load_cell_scale']  # N
+        status['estimated_force_analog_filtered'] = analog_diff_voltage_filtered * config['load_cell_scale']  # N
         
-    def unpack_inputs(self, data):
+    def unpack_inputs(self, data, offset=0):
         """
         Unpack input data from a binary structure, adjusting for the number of monitoring channels.
+        data can be any buffer (bytes, bytearray, memoryview); it is read in place starting at offset.
         """
-        base_format = '<HHHiiiHHi'  # Format for fixed fields
-        mon_channel_format = 'i' * self.num_mon_ch
-        full_format = base_format + mon_channel_format  # Combine formats
-        
-        unpacked_data = struct.unpack(full_format, data)
+        # Format: '<HHHiihxxHHi' for the fixed fields + 'hxx' per monitoring channel (channel 4: 'f')
+        unpacked_data = _INPUT_STRUCTS[self.num_mon_ch].unpack_from(data, offset)
         
         (
             self.inputs['state_var'],
@@ -145,37 +188,15 @@ class LMDrive_Data:
         ) = unpacked_data
 
         # Assign monitoring channels dynamically
-        for i, value in enumerate(mon_channels, start=1):
-            self.inputs[f'mon_ch{i}'] = value
-            if i < 4: 
-                signed_value = self.uint16_to_sint16(value)
-            else:
-                signed_value = self.int32_to_floatieee754(value)
-            self.inputs[f'mon_ch{i}'] = signed_value
-
-    def uint16_to_sint16(self, val):
-        """
-        Converts a 16-bit unsigned integer to a signed integer.
-        """
-        return val - 0x10000 if val >= 0x8000 else val
-    
-    def int32_to_floatieee754(self, val):
-        """
-        Converts a signed 32-bit integer to a float using IEEE 754 format.
-        """
-        import struct
-        packed_val = struct.pack('<i', val)  # pack as int32 (little endian)
-        return struct.unpack('<f', packed_val)[0]
+        self.inputs.update(zip(_MON_CH_KEYS, mon_channels))
 
-    def unpack_outputs(self, data):
+    def unpack_outputs(self, data, offset=0):
         """
         Unpack output data from a binary structure, adjusting for the number of parameter channels.
+        data can be any buffer (bytes, bytearray, memoryview); it is read in place starting at offset.
         """
-        base_format_par = '<HHHHHHHHHHHHHHi'  # Format for fixed fields
-        par_channel_format = 'i' * self.num_par_ch  # Format for dynamic monitoring channels
-        full_format_par = base_format_par + par_channel_format  # Combine formats
-        
-        unpacked_par_data = struct.unpack(full_format_par, data)
+        # Format: '<HHHHHHHHHHHHHHi' for the fixed fields + 'i' per parameter channel
+        unpacked_par_data = _OUTPUT_PAR_STRUCTS[self.num_par_ch].unpack_from(data, offset)
         (
             self.outputs['control_word'],
             self.outputs['mc_header'],
@@ -195,20 +216,26 @@ class LMDrive_Data:
             *par_channels
         ) = unpacked_par_data
 
-        # Assign monitoring channels dynamically
-        for i, value in enumerate(par_channels, start=1):
-            self.outputs[f'par_ch{i}'] = value
+        # Assign parameter channels dynamically
+        self.outputs.update(zip(_PAR_CH_KEYS, par_channels))
     
     def pack_outputs(self):
         """
         Packs the `outputs` dictionary into a binary format.
         """
-        # Define the fixed structure for outputs
-        base_format = '<HHHHHHHHHHHHHHi'
-        par_channel_format = 'H' * self.num_par_ch  # Dynamically add parameter channels
-        full_format = base_format + par_channel_format
+        return _OUTPUT_STRUCTS[self.num_par_ch].pack(*self._outputs_to_pack())
+
+    def pack_outputs_into(self, buffer, offset=0):
+        """
+        Packs the `outputs` dictionary directly into a writable buffer (e.g. bytearray) at offset.
+        """
+        _OUTPUT_STRUCTS[self.num_par_ch].pack_into(buffer, offset, *self._outputs_to_pack())
 
-        # Prepare data for packing
+    def _outputs_to_pack(self):
+        """
+        Returns the `outputs` values in PDO order.
+        """
+        # Format: '<HHHHHHHHHHHHHHi' for the fixed fields + 'H' per parameter channel
         data_to_pack = [
             self.outputs['control_word'],
             self.outputs['mc_header'],
@@ -228,35 +255,19 @@ class LMDrive_Data:
         ]
 
         # Add parameter channels dynamically
-        for i in range(1, self.num_par_ch + 1):
-            data_to_pack.append(self.outputs[f'par_ch{i}'])
+        outputs = self.outputs
+        data_to_pack.extend([outputs[key] for key in _PAR_CH_KEYS[:self.num_par_ch]])
+
+        return data_to_pack
 
-        # Pack the data
-        return struct.pack(full_format, *data_to_pack)
+    def format_status(self):
+        """
+        Returns the drive status and the monitoring channels as one line of text.
+        """
+        return self._STATUS_FORMAT.format(s=self.status, i=self.inputs)
 
     def __str__(self):
-        return (f"Operation_Enabled: {self.status['operation_enabled']}, "
-                f"SwitchOn_Locked: {self.status['switch_on_locked']}, "
-                f"Homed: {self.status['homed']}, "
-                f"Motion_Active: {self.status['motion_active']}, "
-                f"Jogging: {self.status['jogging']}, "
-                f"Warning: {self.status['warning']}, "
-                f"Error: {self.status['error']}, "
-                f"Error_Code: {self.status['error_code']}, "
-                f"Demand_Position: {self.status['demand_position']}, "
-                f"Actual_Position: {self.status['actual_position']}, "
-                f"Difference_Position: {self.status['difference_position']}, "
-                f"Actual_Current: {self.status['actual_current']}, "
-                f"Measured_Force: {self.status['measured_force']}, "
-                f"Analog_Diff_Voltage: {self.status['analog_diff_voltage']}, "
-                f"Analog_Diff_Voltage_Filtered: {self.status['analog_diff_voltage_filtered']}, "
-                f"Analog_Voltage: {self.status['analog_voltage']}, "
-                f"Estimated_Force: {self.status['estimated_force_analog_filtered']}, "
-                f"MonCh1: {self.inputs['mon_ch1']}, "
-                f"MonCh2: {self.inputs['mon_ch2']}, "
-                f"MonCh3: {self.inputs['mon_ch3']}, "
-                f"MonCh4: {self.inputs['mon_ch4']} "
-                )
+        return self.format_status()
 
 
     def __getstate__(self):
@@ -53,7 +53,6 @@ class main_test():
         self.config = None
         
         self.lm_drive_lock = rwlock.RWLockFairD()
-        self.manager = mp.Manager()
 
         # flag to print the status of the drive
         self.print_drive_status = False
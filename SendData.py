@@ -316,11 +316,14 @@ def update_output_cfg(app, active_drive_number, cfg_control, cfg_index_out, cfg_
     
 def send_data_to_slaves(app):
     """
-    Sends packed output data from all drives to the EtherCAT communication queue.
+    Writes packed output data from all drives to the EtherCAT communication update slot.
     """
-    with app.lm_drive_lock.gen_wlock():
-        packed_outputs = [app.lm_drive_data_dict[device].pack_outputs() for device in range(1, app.noDev+1)]
-    app.ethercat_comm.update_queue.put(packed_outputs)
+    output_length = app.ethercat_comm.OutputLength
+    packed_outputs = bytearray(app.noDev * output_length)
+    with app.lm_drive_lock.gen_wlock(): # Also keeps the update slot single-writer
+        for device in range(1, app.noDev+1):
+            app.lm_drive_data_dict[device].pack_outputs_into(packed_outputs, (device-1) * output_length)
+        app.ethercat_comm.update_slot.write(packed_outputs)
     
 
 
@@ -0,0 +1,148 @@
+import ctypes
+import datetime
+import multiprocessing as mp
+import queue
+import struct
+import time
+
+
+class _SharedBytes:
+    """
+    Base for the shared byte buffers: an mp.RawArray plus a lazily created memoryview on it.
+    """
+    def __init__(self, size:int):
+        self._buf = mp.RawArray(ctypes.c_ubyte, size)
+        self._view = None
+
+    def __getstate__(self):
+        """memoryviews are not picklable, each process creates its own."""
+        state = self.__dict__.copy()
+        state['_view'] = None
+        return state
+
+    def _buffer(self):
+        if self._view is None:
+            self._view = memoryview(self._buf).cast('B')
+        return self._view
+
+
+class SeqlockBuffer(_SharedBytes):
+    """
+    Shared byte buffer with a single writer and any number of readers, without a lock.
+
+    The writer makes the sequence number odd while it copies and even again when done. Readers
+    retry when the number was odd or changed during their copy, so they never see a torn write
+    and the writer never waits for a reader.
+
+    Attributes:
+        size (int): Size of the buffer in bytes.
+    """
+    def __init__(self, size:int):
+        super().__init__(size)
+        self.size = size
+        self._seq = mp.RawValue(ctypes.c_uint64, 0)
+
+    def write(self, data):
+        """Copies data to the start of the buffer (writer process only)."""
+        seq = self._seq.value
+        self._seq.value = seq + 1 # Odd: write in progress
+        self._buffer()[:len(data)] = data
+        self._seq.value = seq + 2 # Even: stable
+
+    def read(self, start:int=0, stop:int=None):
+        """Returns a consistent copy of buffer[start:stop] as bytes, retrying while the writer is active."""
+        buf = self._buffer()
+        while True:
+            seq = self._seq.value
+            if seq & 1:
+                continue
+            data = bytes(buf[start:stop])
+            if self._seq.value == seq:
+                return data
+
+    def read_if_newer(self, seen, start:int=0, stop:int=None):
+        """
+        Returns (seq, bytes) like read(), or (seen, None) if nothing was written since sequence number seen.
+        Never waits: while a write is in progress, or if the copy was torn, it also returns (seen, None),
+        so a real-time caller simply picks the data up on its next call.
+        """
+        seq = self._seq.value
+        if seq == seen or seq & 1:
+            return seen, None
+        data = bytes(self._buffer()[start:stop])
+        if self._seq.value != seq:
+            return seen, None
+        return seq, data
+
+
+class SpscRing(_SharedBytes):
+    """
+    Lock-free single-producer / single-consumer ring buffer in shared memory.
+
+    Each slot holds a timestamp and a fixed-size payload. Only the producer writes `tail` and only
+    the consumer writes `head`, so no lock is needed as long as there is exactly one of each.
+    Supports the put_nowait / get_nowait / empty calls used on the former mp.Queue. Entries that do
+    not fit are counted in shared memory instead of being reported one by one (see take_dropped).
+
+    Attributes:
+        payload_size (int): Size of each payload in bytes.
+        capacity (int): Number of slots.
+    """
+    _TIMESTAMP = struct.Struct('<d')
+
+    def __init__(self, payload_size:int, capacity:int):
+        self.payload_size = payload_size
+        self.capacity = capacity
+        self.slot_size = self._TIMESTAMP.size + payload_size
+        super().__init__(self.slot_size * capacity)
+        self._head = mp.RawValue(ctypes.c_uint64, 0) # Next slot to read (consumer only)
+        self._tail = mp.RawValue(ctypes.c_uint64, 0) # Next slot to write (producer only)
+        self._dropped = mp.RawValue(ctypes.c_uint64, 0) # Entries rejected because the ring was full (producer only)
+        self._dropped_seen = mp.RawValue(ctypes.c_uint64, 0) # Drops already returned by take_dropped (consumer only)
+
+    def put_nowait(self, payload, timestamp:float=None):
+        """
+        Copies payload (payload_size bytes) into the next free slot.
+
+        Raises:
+            queue.Full: If the consumer has not freed a slot yet (the entry is counted as dropped).
+        """
+        tail = self._tail.value
+        if tail - self._head.value >= self.capacity:
+            self._dropped.value += 1
+            raise queue.Full
+        buf = self._buffer()
+        offset = (tail % self.capacity) * self.slot_size
+        self._TIMESTAMP.pack_into(buf, offset, time.time() if timestamp is None else timestamp)
+        buf[offset + self._TIMESTAMP.size:offset + self.slot_size] = payload
+        self._tail.value = tail + 1 # Publish the slot only after it has been written
+
+    def get_nowait(self):
+        """
+        Returns the oldest entry as (datetime, bytes).
+
+        Raises:
+            queue.Empty: If there is nothing to read.
+        """
+        head = self._head.value
+        if head == self._tail.value:
+            raise queue.Empty
+        buf = self._buffer()
+        offset = (head % self.capacity) * self.slot_size
+        timestamp, = self._TIMESTAMP.unpack_from(buf, offset)
+        payload = bytes(buf[offset + self._TIMESTAMP.size:offset + self.slot_size])
+        self._head.value = head + 1 # Release the slot only after it has been copied
+        return datetime.datetime.fromtimestamp(timestamp), payload
+
+    def empty(self):
+        return self._head.value == self._tail.value
+
+    def qsize(self):
+        return self._tail.value - self._head.value
+
+    def take_dropped(self):
+        """Returns the number of entries dropped since the last call (consumer only)."""
+        dropped = self._dropped.value
+        new = dropped - self._dropped_seen.value
+        self._dropped_seen.value = dropped
+        return new
@@ -7,6 +7,12 @@ import threading
 import time
 import queue
 
+# Precompiled input layouts, indexed by the number of monitoring channels (0 to 4)
+_INPUT_STRUCTS = [struct.Struct('<HHHiiiHHi' + 'i' * n) for n in range(5)]
+_INT32 = struct.Struct('<i')
+_FLOAT32 = struct.Struct('<f')
+_FLOAT64 = struct.Struct('<d')
+
 def process_input_data(app):
         """
         Processes the input data received from the EtherCAT communication.
@@ -19,15 +25,12 @@ def process_input_data(app):
             data_length (int): The length of data block for each device.
 
         Functionality:
-            - Locks access to shared data for thread safety.
+            - Reads a consistent copy of the shared input data (lock-free).
             - Unpacks the data from the drives and updates internal data structures.
             - Tracks changes in the data to detect new updates.
         """
-        with app.lock:
-            all_slave_data = app.ethercat_comm.data[:]
-        
-        # Read Data from Drive
-        device_data = bytes(all_slave_data[0:app.data_length])
+        # Read Data from Drive (copy only the first device's block)
+        device_data = app.ethercat_comm.data.read(0, app.data_length)
         with app.lm_drive_lock.gen_wlock():
             app.lm_drive_data_dict[1].unpack_inputs(device_data)
             app.lm_drive_data_dict[1].update_calculated_fields()
@@ -64,9 +67,6 @@ def loop_print_data(app):
         print(f'Background data printing started for {app.noDev} devices')
         while not app.ethercat_comm.stop_event.is_set():
             app.print_comm_messages()
-
-            with app.lock:
-                all_slave_data = app.ethercat_comm.data[:]
             app.process_input_data()
 
             with app.lm_drive_lock.gen_rlock():
@@ -94,9 +94,16 @@ def save_latency_to_csv(latency_queue, filename="latency_log.csv"):
             if not file_exists:
                 writer.writeheader()
 
-            while not latency_queue.empty():
-                latency_data = latency_queue.get()
-                writer.writerow(latency_data)
+            while True:
+                try:
+                    timestamp, raw = latency_queue.get_nowait()
+                except queue.Empty:
+                    break
+                writer.writerow({'timestamp': timestamp, 'latency': _FLOAT64.unpack(raw)[0]})
+
+        dropped = latency_queue.take_dropped()
+        if dropped:
+            print(f"Warning: latency_queue was full, {dropped} cycles were not recorded (capacity: {latency_queue.capacity}).")
 
 
 def save_oszi(app, filename=None):
@@ -115,6 +122,10 @@ def save_oszi(app, filename=None):
             except queue.Empty:
                 break
 
+    dropped = app.data_queue.take_dropped()
+    if dropped:
+        print(f"Warning: data_queue was full, {dropped} cycles were not recorded (max_record_time: {app.max_record_time}s).")
+
     if not data_with_timestamps:
         print("Queue is empty. Nothing to save.")
         return
@@ -135,8 +146,7 @@ def save_oszi(app, filename=None):
         if isinstance(raw_data, list):
             raw_data = bytes(raw_data)
 
-        device_data_chunk = raw_data[0:app.InputLength]
-        unpacked_dict = unpack_input_data(app, device_data_chunk)
+        unpacked_dict = unpack_input_data(app, raw_data) # unpack_from reads only the first device's block
         status = update_calculated_fields_from_inputs(app, unpacked_dict)
 
         if not header_written:
@@ -177,15 +187,11 @@ def unpack_input_data(app, data):
         """
         Converts a signed 32-bit integer to a float using IEEE 754 format.
         """
-        import struct
-        packed_val = struct.pack('<i', val)  # pack as int32 (little endian)
-        return struct.unpack('<f', packed_val)[0]
+        packed_val = _INT32.pack(val)  # pack as int32 (little endian)
+        return _FLOAT32.unpack(packed_val)[0]
     
-    base_format = '<HHHiiiHHi'
-    mon_channel_format = 'i' * app.no_Monitoring
-    full_format = base_format + mon_channel_format
-
-    unpacked = struct.unpack(full_format, data)
+    # Format: '<HHHiiiHHi' + 'i' per monitoring channel
+    unpacked = _INPUT_STRUCTS[app.no_Monitoring].unpack_from(data)
 
     # Convert the monitoring channels to signed integers
     unpacked = list(unpacked)